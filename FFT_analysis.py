@@ -1,31 +1,143 @@
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
+from scipy.signal import CZT
+from functools import lru_cache
 import os
 
-def load_data(filename):
-    df = pd.read_csv(filename)
+import fft_backend
+from csv_loader import load_csv
+from table_io import output_path, save_table
+
+IFFT_COLUMNS = ['IFFT Real', 'IFFT Imag', 'IFFT Magnitude']
+
+def load_data(filename, dtype=np.float64):
+    # Only the IFFT columns (and the half-spectrum length, if present) are used; float32 gives a complex64 FFT
+    df = load_csv(filename, header=True, usecols=lambda col: col in IFFT_COLUMNS or col == 'Full Length',
+                  dtype={col: dtype for col in IFFT_COLUMNS})
     return df
 
 def compute_fft(signal):
-    fft_result = np.fft.fft(signal)
+    fft_result = fft_backend.fft(signal)
     power = np.abs(fft_result)
     phase = np.angle(fft_result)
     return power, phase
 
-def save_fft_output(filename, power, phase):
+def compute_fft_real(signal):
+    """
+    compute_fft for a real signal using rfft: only the non-redundant bins 0..n//2 are
+    computed and returned, together with the full spectrum length n.
+    """
+    fft_result = fft_backend.rfft(signal)
+    return np.abs(fft_result), np.angle(fft_result), fft_backend.transform_length(len(signal))
+
+def reconstruct_fft_output(power, phase, full_length):
+    """Rebuild the full-length power and phase from a half spectrum (power is even, phase odd)."""
+    fft_result = fft_backend.hermitian_full(np.asarray(power) * np.exp(1j * np.asarray(phase)), full_length)
+    return np.abs(fft_result), np.angle(fft_result)
+
+def compute_fft_batch(signals, axis=-1):
+    """Batched compute_fft for a (scans x samples) array: one FFT call along `axis`."""
+    fft_result = fft_backend.fft(signals, axis=axis)
+    return np.abs(fft_result), np.angle(fft_result)
+
+def average_spectra(signals, mode='coherent', axis=-1, scan_axis=0):
+    """
+    FFT every scan along `axis` and average over `scan_axis`.
+    mode='coherent' averages the complex spectra, so power is |mean(X)|.
+    mode='incoherent' averages |X|^2 and returns its square root, so the power stays in the
+    same units as compute_fft while ignoring scan-to-scan phase jitter.
+    Phase is the angle of the complex mean in both modes.
+    """
+    fft_result = fft_backend.fft(signals, axis=axis)
+    mean_spectrum = fft_result.mean(axis=scan_axis)
+    if mode == 'coherent':
+        power = np.abs(mean_spectrum)
+    elif mode == 'incoherent':
+        power = np.sqrt(np.mean(np.abs(fft_result)**2, axis=scan_axis))
+    else:
+        raise ValueError(f"Unknown averaging mode {mode!r}, expected 'coherent' or 'incoherent'")
+    return power, np.angle(mean_spectrum)
+
+@lru_cache(maxsize=16)
+def zoom_transform(n, bin_start, oversample, points):
+    # Chirp-z plans (chirps and their FFT) are reused for repeated scans of the same length and band
+    transform_len = fft_backend.transform_length(n)
+    return CZT(n, points, w=np.exp(-2j * np.pi / (transform_len * oversample)),
+               a=np.exp(2j * np.pi * bin_start / transform_len))
+
+def compute_zoom_fft(signal, bin_start, bin_stop, oversample=10, axis=-1):
+    """
+    Zoom spectrum by chirp-z transform: power and phase at FFT bins bin_start..bin_stop in steps
+    of 1/oversample, in the same bin units as compute_fft (integer bins give the same values).
+    Returns (bins, power, phase). The cost is a few FFTs of about len(signal) + number of
+    points, instead of one FFT of len(signal) x oversample with zero-padding.
+    """
+    signal = np.asarray(signal)
+    points = int(round((bin_stop - bin_start) * oversample)) + 1
+    bins = bin_start + np.arange(points) / oversample
+    zoom_result = zoom_transform(signal.shape[axis], float(bin_start), int(oversample), points)(signal, axis=axis)
+    return bins, np.abs(zoom_result), np.angle(zoom_result)
+
+def save_fft_output(filename, power, phase, full_length=None, fft_bin=None, suffix="_fft"):
+    """Write FFT Bin/Power/Phase; fft_bin defaults to 0..len(power)-1 (pass the bins of a zoom spectrum)."""
     base, ext = os.path.splitext(filename)
-    output_filename = f"{base}_fft.csv"
-    fft_bin = np.arange(len(power))
-    df_out = pd.DataFrame({
+    output_filename = output_path(f"{base}{suffix}", ".csv")
+    if fft_bin is None:
+        fft_bin = np.arange(len(power))
+    columns = {
         'FFT Bin': fft_bin,
-        'Power': np.round(power, 6),
-        'Phase': np.round(phase, 6)
-    })
-    df_out.to_csv(output_filename, index=False)
+        'Power': power,
+        'Phase': phase
+    }
+    if full_length is not None:
+        columns['Full Length'] = np.full(len(power), full_length)
+    save_table(output_filename, columns)
     print(f"FFT results saved to: {output_filename}")
     return output_filename
 
+def select_signal(df, choice):
+    """Build the FFT input signal from the IFFT columns for input mode A/B/C/D."""
+    if 'Full Length' in df.columns:
+        # Half spectrum from IFFT mode B: rebuild the full IFFT output first
+        half = df['IFFT Real'].values + 1j * df['IFFT Imag'].values
+        transformed = fft_backend.hermitian_full(half, int(df['Full Length'].iloc[0]))
+        df = pd.DataFrame({
+            'IFFT Real': np.real(transformed),
+            'IFFT Imag': np.imag(transformed),
+            'IFFT Magnitude': np.abs(transformed)
+        })
+
+    if choice == 'A':
+        if 'IFFT Real' in df.columns and 'IFFT Imag' in df.columns:
+            signal = df['IFFT Real'].values + 1j * df['IFFT Imag'].values
+        else:
+            print("Error: Both 'IFFT Real' and 'IFFT Imag' columns are required for this option.")
+            return None
+    elif choice == 'B':
+        if 'IFFT Real' in df.columns:
+            signal = df['IFFT Real'].values
+        else:
+            print("Error: 'IFFT Real' column not found.")
+            return None
+    elif choice == 'C':
+        if 'IFFT Imag' in df.columns:
+            signal = df['IFFT Imag'].values
+        else:
+            print("Error: 'IFFT Imag' column not found.")
+            return None
+    elif choice == 'D':
+        if 'IFFT Magnitude' in df.columns:
+            signal = df['IFFT Magnitude'].values
+        else:
+            print("Error: 'IFFT Magnitude' column not found.")
+            return None
+    else:
+        print("Invalid choice. Please select A, B, C, or D.")
+        return None
+
+    return signal
+
 def plot_fft(index, power, phase):
     plt.figure(figsize=(12, 6))
     plt.subplot(2, 1, 1)
@@ -64,36 +176,25 @@ def main():
 
     choice = input("\nEnter choice (A/B/C/D): ").strip().upper()
 
-    if choice == 'A':
-        if 'IFFT Real' in df.columns and 'IFFT Imag' in df.columns:
-            signal = df['IFFT Real'].values + 1j * df['IFFT Imag'].values
-        else:
-            print("Error: Both 'IFFT Real' and 'IFFT Imag' columns are required for this option.")
-            return
-    elif choice == 'B':
-        if 'IFFT Real' in df.columns:
-            signal = df['IFFT Real'].values
-        else:
-            print("Error: 'IFFT Real' column not found.")
-            return
-    elif choice == 'C':
-        if 'IFFT Imag' in df.columns:
-            signal = df['IFFT Imag'].values
-        else:
-            print("Error: 'IFFT Imag' column not found.")
-            return
-    elif choice == 'D':
-        if 'IFFT Magnitude' in df.columns:
-            signal = df['IFFT Magnitude'].values
-        else:
-            print("Error: 'IFFT Magnitude' column not found.")
-            return
-    else:
-        print("Invalid choice. Please select A, B, C, or D.")
+    signal = select_signal(df, choice)
+    if signal is None:
         return
 
-    power, phase = compute_fft(signal)
-    output_file = save_fft_output(filename, power, phase)
+    zoom = input("Zoom into a bin range with chirp-z instead of the full spectrum? (Y/N): ").strip().upper() == 'Y'
+    if zoom:
+        bin_start, bin_stop = (float(value) for value in input("Bin range as start-end (e.g., 300-1500): ").split('-'))
+        oversample = int(input("Points per FFT bin (default 10): ") or 10)
+        fft_bin, power, phase = compute_zoom_fft(signal, bin_start, bin_stop, oversample)
+        output_file = save_fft_output(filename, power, phase, fft_bin=fft_bin, suffix="_zoomfft")
+    elif choice == 'A':
+        power, phase = compute_fft(signal)
+        output_file = save_fft_output(filename, power, phase)
+        fft_bin = np.arange(len(power))
+    else:
+        # Real input: only the non-redundant half of the spectrum is computed and stored
+        power, phase, full_length = compute_fft_real(signal)
+        output_file = save_fft_output(filename, power, phase, full_length)
+        fft_bin = np.arange(len(power))
 
     print("\nWould you like to plot the FFT results?")
     print("A: Yes")
@@ -101,7 +202,6 @@ def main():
     show_plot = input("Enter choice (A/B): ").strip().upper()
 
     if show_plot == 'A':
-        fft_bin = np.arange(len(power))
         plot_fft(fft_bin, power, phase)
 
 if __name__ == "__main__":
@@ -1,43 +1,82 @@
 import numpy as np
-import pandas as pd
 import os
 import matplotlib.pyplot as plt
 
-def read_crossing_csv(filename):
-    """Read zero-crossing data and extract the measurement signal."""
-    df = pd.read_csv(filename)
+import fft_backend
+from csv_loader import load_csv
+from table_io import output_path, save_table
+
+def read_crossing_csv(filename, dtype=np.float64):
+    """Read zero-crossing data and extract the measurement signal (float32 input gives a complex64 IFFT)."""
+    df = load_csv(filename, header=True, dtype={'Measurement at Zero-Crossing': dtype})
     return df['Measurement at Zero-Crossing'].values, df
 
+def perform_ifft_complex(signal):
+    """perform_ifft without splitting the result into columns."""
+    return fft_backend.ifft(signal)
+
 def perform_ifft(signal):
     """
     Perform IFFT on the signal.
     Returns real, imaginary, and magnitude components.
     """
-    transformed = np.fft.ifft(signal)
+    transformed = perform_ifft_complex(signal)
     real_part = np.real(transformed)
     imag_part = np.imag(transformed)
     magnitude = np.abs(transformed)
     return real_part, imag_part, magnitude
 
-def save_ifft_output(filename, real, imag, magnitude):
-    """Save IFFT output with consistent columns: Real, Imag, Magnitude."""
+def perform_ifft_half(signal):
+    """
+    IFFT of a real signal computed with rfft, keeping only the non-redundant bins 0..n//2.
+    ifft(x)[k] = conj(rfft(x)[k]) / n for real x; the other half is the complex conjugate mirror.
+    Returns real, imaginary, magnitude and the full spectrum length n.
+    """
+    n = fft_backend.transform_length(len(signal))
+    transformed = np.conj(fft_backend.rfft(signal)) / n
+    return np.real(transformed), np.imag(transformed), np.abs(transformed), n
+
+def reconstruct_ifft_output(real, imag, full_length):
+    """Rebuild full-length real, imaginary and magnitude columns from a half spectrum."""
+    transformed = fft_backend.hermitian_full(np.asarray(real) + 1j * np.asarray(imag), full_length)
+    return np.real(transformed), np.imag(transformed), np.abs(transformed)
+
+def perform_ifft_batch(signals, axis=-1):
+    """
+    Batched perform_ifft for a (scans x samples) array: one IFFT call along `axis`.
+    Returns real, imaginary, and magnitude arrays of the same shape.
+    """
+    transformed = fft_backend.ifft(signals, axis=axis)
+    return np.real(transformed), np.imag(transformed), np.abs(transformed)
+
+def save_ifft_output(filename, real, imag, magnitude, full_length=None):
+    """
+    Save IFFT output with consistent columns: Real, Imag, Magnitude.
+    For a half spectrum from perform_ifft_half, pass full_length and it is stored in a
+    'Full Length' column so later stages can tell the two apart and rebuild the full spectrum.
+    """
     base, ext = os.path.splitext(filename)
-    output_filename = f"{base}_ifft.csv"
+    output_filename = output_path(f"{base}_ifft", ".csv")
 
-    df_out = pd.DataFrame({
-        'IFFT Real': np.round(real, 6),
-        'IFFT Imag': np.round(imag, 6),
-        'IFFT Magnitude': np.round(magnitude, 6)
-    })
+    columns = {
+        'IFFT Real': real,
+        'IFFT Imag': imag,
+        'IFFT Magnitude': magnitude
+    }
+    if full_length is not None:
+        columns['Full Length'] = np.full(len(real), full_length)
 
-    df_out.to_csv(output_filename, index=False)
+    save_table(output_filename, columns)
     print(f"Saved IFFT results to {output_filename}")
 
-def plot_results(original_signal, real, imag, magnitude, plot_mode, mode_label):
-    # Apply fftshift for visual clarity only
-    shifted_real = np.fft.fftshift(real)
-    shifted_imag = np.fft.fftshift(imag)
-    shifted_magnitude = np.fft.fftshift(magnitude)
+def plot_results(original_signal, real, imag, magnitude, plot_mode, mode_label, half_spectrum=False):
+    # Apply fftshift for visual clarity only; a half spectrum is already in order
+    if half_spectrum:
+        shifted_real, shifted_imag, shifted_magnitude = real, imag, magnitude
+    else:
+        shifted_real = fft_backend.fftshift(real)
+        shifted_imag = fft_backend.fftshift(imag)
+        shifted_magnitude = fft_backend.fftshift(magnitude)
 
     plt.figure(figsize=(10, 6))
 
@@ -101,10 +140,15 @@ def main():
     plot_mode = input("Enter choice (A/B): ").strip().upper()
 
     signal, full_df = read_crossing_csv(filename)
-    real, imag, magnitude = perform_ifft(signal)
-    save_ifft_output(filename, real, imag, magnitude)
+    if mode_choice == 'B':
+        # Real input, real-only output: the second half of the spectrum is redundant
+        real, imag, magnitude, full_length = perform_ifft_half(signal)
+        save_ifft_output(filename, real, imag, magnitude, full_length)
+    else:
+        real, imag, magnitude = perform_ifft(signal)
+        save_ifft_output(filename, real, imag, magnitude)
 
-    plot_results(signal, real, imag, magnitude, plot_mode, mode_label)
+    plot_results(signal, real, imag, magnitude, plot_mode, mode_label, half_spectrum=mode_choice == 'B')
 
 if __name__ == "__main__":
     main()
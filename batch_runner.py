@@ -0,0 +1,106 @@
+"""
+Run one saved pipeline (pipeline.save_settings) over every capture matching a glob.
+
+Files are split into small batches that a pool of worker processes picks up. Inside a worker,
+the next capture is read on a background thread while the current one is processed, so disk
+reads overlap computation. The fitted coefficients of every file end up in one summary table;
+a file that fails gets its error message in the table instead of stopping the batch.
+"""
+import glob
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import nullcontext, redirect_stdout
+from itertools import repeat
+
+import pandas as pd
+
+import fft_backend
+from pipeline import Pipeline, load_settings, prompt_settings, save_settings
+from truncating import load_data
+
+def init_worker(fft_workers):
+    # Share the cores between processes instead of every process using all of them
+    fft_backend.set_workers(fft_workers)
+
+def summary_row(filename, results):
+    *betas, w0 = results['fit']
+    row = {'File': filename}
+    for n, beta in enumerate(betas):
+        row[f"Beta_{n}"] = float(beta)
+    row['w0'] = float(w0)
+    return row
+
+def run_files(settings, filenames, verbose=False):
+    """Run the pipeline on each file in turn, reading the next file while the current one runs."""
+    pipeline = Pipeline(**settings)
+    rows = []
+    with ThreadPoolExecutor(max_workers=1) as reader, open(os.devnull, 'w') as devnull:
+        pending = reader.submit(load_data, filenames[0], dtype=pipeline.dtype)
+        for i, filename in enumerate(filenames):
+            current = pending
+            if i + 1 < len(filenames):
+                pending = reader.submit(load_data, filenames[i + 1], dtype=pipeline.dtype)
+            try:
+                with nullcontext() if verbose else redirect_stdout(devnull):
+                    results = pipeline.run(filename, current.result())
+                rows.append(summary_row(filename, results))
+            except Exception as error:
+                rows.append({'File': filename, 'Error': f"{type(error).__name__}: {error}"})
+    return rows
+
+def run_batch(pattern, settings, processes=None, chunk_size=None, verbose=False):
+    """
+    Run Pipeline(**settings) on every file matching `pattern` (a glob or a list of files) across
+    `processes` worker processes (default: all cores; 1 runs in this process).
+    chunk_size is the number of files handed to a worker at a time (default: about four
+    chunks per process). Returns the summary DataFrame, one row per file, in file order.
+    """
+    filenames = sorted(glob.glob(pattern)) if isinstance(pattern, str) else list(pattern)
+    if not filenames:
+        raise ValueError(f"No files match {pattern!r}")
+    processes = min(processes or os.cpu_count() or 1, len(filenames))
+    chunk_size = chunk_size or max(len(filenames) // (processes * 4), 1)
+    chunks = [filenames[i:i + chunk_size] for i in range(0, len(filenames), chunk_size)]
+
+    rows = []
+    if processes == 1:
+        chunk_results = map(run_files, repeat(settings), chunks, repeat(verbose))
+        pool = nullcontext()
+    else:
+        fft_workers = max((os.cpu_count() or 1) // processes, 1)
+        pool = ProcessPoolExecutor(processes, initializer=init_worker, initargs=(fft_workers,))
+        chunk_results = pool.map(run_files, repeat(settings), chunks, repeat(verbose))
+    with pool:
+        for chunk_rows in chunk_results:
+            rows.extend(chunk_rows)
+            print(f"Processed {len(rows)}/{len(filenames)} files")
+
+    summary = pd.DataFrame(rows)
+    if 'Error' not in summary.columns:
+        summary['Error'] = None
+    columns = ['File'] + [col for col in summary.columns if col.startswith('Beta_')] + ['w0', 'Error']
+    return summary.reindex(columns=columns)
+
+def main():
+    pattern = input("Enter a glob pattern for the raw CSV files (e.g., captures/*.csv): ").strip('"')
+    settings_file = input("Pipeline settings file (blank = enter the settings now): ").strip('"')
+    if settings_file:
+        settings = load_settings(settings_file)
+    else:
+        settings = prompt_settings()
+        settings_file = input("Save these settings to (blank = don't save): ").strip('"')
+        if settings_file:
+            save_settings(settings_file, settings)
+    processes = int(input(f"Number of worker processes (default {os.cpu_count()}): ") or 0) or None
+    output_filename = input("Summary CSV file (default batch_summary.csv): ").strip('"') or "batch_summary.csv"
+
+    summary = run_batch(pattern, settings, processes)
+    summary.to_csv(output_filename, index=False)
+    print(summary.to_string(index=False))
+    print(f"\nSummary saved as: {output_filename}")
+    failed = summary['Error'].notna().sum()
+    if failed:
+        print(f"{failed} file(s) failed, see the Error column.")
+
+if __name__ == "__main__":
+    main()
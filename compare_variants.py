@@ -0,0 +1,36 @@
+import os
+from contextlib import redirect_stdout
+
+from pipeline import Pipeline, load_settings, parse_range_setting, prompt_settings
+
+def print_comparison(labels, results):
+    print()
+    for label, result in zip(labels, results):
+        *betas, w0 = result['fit']
+        coefficients = ", ".join(f"Beta_{n} = {beta:.6g}" for n, beta in enumerate(betas))
+        print(f"{label}: {coefficients}, w0 = {w0:.2f}")
+
+def main():
+    filename = input("Enter raw CSV file path: ").strip('"')
+    settings_file = input("Pipeline settings file (blank = enter the settings now): ").strip('"')
+    settings = load_settings(settings_file) if settings_file else prompt_settings()
+
+    print("\nCompare: W = candidate IFFT windows, M = FFT input modes")
+    choice = input("Enter choice (W/M): ").strip().upper()
+    if choice == 'W':
+        print("Enter each candidate as start-end ranges, comma separated; separate candidates with ';'")
+        candidates = [parse_range_setting(text) for text in input("Candidates: ").split(';') if text.strip()]
+        variants = [{'window_ranges': ranges} for ranges in candidates]
+        labels = [f"Window {ranges}" for ranges in candidates]
+    else:
+        modes = [mode.strip().upper() for mode in (input("Modes, comma separated (default A,B,C): ") or "A,B,C").split(',')]
+        variants = [{'fft_mode': mode} for mode in modes]
+        labels = [f"Mode {mode}" for mode in modes]
+
+    pipeline = Pipeline(**settings)
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        results = pipeline.compare(filename, variants)
+    print_comparison(labels, results)
+
+if __name__ == "__main__":
+    main()
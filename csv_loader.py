@@ -0,0 +1,87 @@
+"""
+Shared CSV loader used by every stage script. Binary .npy tables written by table_io are
+recognised from their magic bytes and memory-mapped instead of parsed.
+
+The header is found by reading only the first few KB of the file, and the file is then parsed
+once, keeping only the requested columns. Set DSP_CSV_ENGINE=pyarrow to use the (optional,
+multi-threaded) pyarrow parser; the pandas C parser is used when it is not installed.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from table_io import is_binary, load_binary
+
+ENGINE = os.environ.get('DSP_CSV_ENGINE', 'c')
+SNIFF_BYTES = 64 * 1024
+
+def parser_engine(engine=None):
+    engine = engine or ENGINE
+    if engine == 'pyarrow':
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            print("pyarrow is not installed — using the pandas C parser.")
+            return 'c'
+    return engine
+
+def is_numeric_row(line):
+    try:
+        float(line.strip().split(',')[0])
+        return True
+    except ValueError:
+        return False
+
+def find_data_start(filename, sniff_bytes=SNIFF_BYTES):
+    """
+    Index of the first line whose first field is a number, reading the file in sniff_bytes
+    blocks so only the start of the file is touched. Returns 0 if no numeric row is found.
+    """
+    with open(filename, 'r', newline='') as file:
+        line_number = 0
+        partial = ''
+        while True:
+            block = file.read(sniff_bytes)
+            if not block:
+                return 0 if not is_numeric_row(partial) else line_number
+            lines = (partial + block).split('\n')
+            partial = lines.pop()
+            for line in lines:
+                if is_numeric_row(line):
+                    return line_number
+                line_number += 1
+
+def load_csv(filename, usecols=None, header=False, dtype=None, engine=None):
+    """
+    Load a pipeline CSV in a single pass.
+    header=False: raw capture, non-numeric preamble rows are skipped and columns are numbered
+    0, 1, ... like pd.read_csv(header=None). header=True: the row just before the first numeric
+    row holds the column names. usecols selects columns by number or name; dtype is passed to
+    pandas (raw captures default to float64).
+    """
+    if is_binary(filename):
+        return load_binary_table(filename, usecols, header)
+    start = find_data_start(filename)
+    engine = parser_engine(engine)
+    if header:
+        return pd.read_csv(filename, skiprows=max(start - 1, 0), header=0, usecols=usecols,
+                           dtype=dtype, engine=engine)
+    return pd.read_csv(filename, skiprows=start, header=None, usecols=usecols,
+                       dtype=np.float64 if dtype is None else dtype, engine=engine)
+
+def load_binary_table(filename, usecols=None, header=False):
+    """
+    DataFrame view of a binary table; raw captures get numbered columns like the CSV path.
+    The columns stay views into the memory-mapped file (read-only), nothing is read up front.
+    """
+    table = load_binary(filename)
+    names = list(table.dtype.names)
+    keys = names if header else [int(name) for name in names]
+    if callable(usecols):
+        selected = [key for key in keys if usecols(key)]
+    elif usecols is not None:
+        selected = [key for key in keys if key in usecols]
+    else:
+        selected = keys
+    return pd.DataFrame({key: table[str(key)] for key in selected}, copy=False)
@@ -0,0 +1,291 @@
+"""
+Fast CSV export used by table_io for every save_* function.
+
+Columns are rounded and formatted block by block and written through a large buffer, so rows
+go to disk as they are produced. The text is byte-for-byte what DataFrame.to_csv writes for the
+same (np.round-ed) columns: shortest round-trip floats, '' for NaN, os.linesep line endings.
+float32 columns are widened to float64 first, so they are rounded and written like float64
+data (rounding in float32 would get the sixth decimal wrong).
+
+Integers, and floats already rounded to `decimals` places with 1e-4 <= |x| < 1e9 (or zero), are
+turned into digits with array arithmetic; repr of such a value is exactly its decimal expansion
+with trailing zeros dropped. Full-precision columns (decimals=None) take the same route for
+values whose repr has at most 15 significant digits (see shortest_decimals), which covers raw
+captures and the zeros of windowed data. Everything else (NaN, inf, tiny or huge values, 16-17
+digit values) goes through repr.
+
+Settings (module level, or through the environment before import):
+    WORKERS     formatting workers per writer (DSP_CSV_WORKERS, default 1 = format in-line)
+    EXECUTOR    'thread' or 'process' (DSP_CSV_EXECUTOR, default 'process'); formatting is
+                Python-level string work, so processes scale and threads mostly overlap I/O
+    CHUNK_ROWS  rows formatted per task (DSP_CSV_CHUNK_ROWS, default 200000)
+"""
+import csv
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+
+WORKERS = int(os.environ.get('DSP_CSV_WORKERS', 1))
+EXECUTOR = os.environ.get('DSP_CSV_EXECUTOR', 'process')
+CHUNK_ROWS = int(os.environ.get('DSP_CSV_CHUNK_ROWS', 200_000))
+BUFFER_BYTES = 16 * 1024 * 1024
+POWERS_OF_TEN = 10 ** np.arange(19, dtype=np.int64)
+MAX_SHORT_DIGITS = 10**15
+
+def repr_cells(values):
+    """Characters of each value as DataFrame.to_csv writes it, as an (n, width) byte matrix and mask."""
+    text = [repr(value) for value in values.tolist()]
+    if values.dtype.kind == 'f':
+        for i in np.flatnonzero(np.isnan(values)):
+            text[i] = ''
+    cells = np.array(text, dtype=bytes)
+    width = max(cells.dtype.itemsize, 1)
+    chars = cells.view(np.uint8).reshape(len(text), -1) if len(text) else np.zeros((0, width), np.uint8)
+    return chars, chars != 0
+
+def digit_cells(magnitude, width=None):
+    """Right-aligned decimal digits of non-negative integers, and the mask of significant ones."""
+    ndigits = np.maximum(np.searchsorted(POWERS_OF_TEN, magnitude, side='right'), 1)
+    width = width or int(ndigits.max(initial=1))
+    shifts = POWERS_OF_TEN[width - 1::-1]
+    chars = (magnitude[:, None] // shifts % 10 + ord('0')).astype(np.uint8)
+    return chars, np.arange(width) >= width - ndigits[:, None]
+
+def shortest_decimals(values):
+    """
+    Per value, the fewest decimal places d <= 18 at which k / 10**d == value for the integer
+    k = rint(|value| * 10**d) < 1e15, with k, or d = -1 where there is none. k and 10**d are
+    exact doubles, so the division is correctly rounded and the test is an exact round trip;
+    with at most 15 significant digits the grid of d-place decimals is coarser than the spacing
+    of doubles, so k is the only candidate and its digits are the ones repr prints.
+    """
+    magnitude = np.abs(values)
+    decimals = np.full(len(values), -1)
+    scaled = np.zeros(len(values), np.int64)
+    pending = np.flatnonzero((magnitude >= 1e-4) & (magnitude < 1e15))
+    # One test at 15 significant digits drops the full-precision values; a value that fails it
+    # (a misjudged exponent included) is only sent to repr, which is slower, not wrong
+    places = np.clip(14 - np.floor(np.log10(magnitude[pending])), 0, 18)
+    pending = pending[np.rint(magnitude[pending] * 10.0**places) / 10.0**places == magnitude[pending]]
+    pending = np.concatenate([np.flatnonzero(magnitude == 0), pending])
+    for d in range(19):
+        if pending.size == 0:
+            break
+        candidate = np.rint(magnitude[pending] * 10.0**d)
+        found = (candidate < MAX_SHORT_DIGITS) & (candidate / 10.0**d == magnitude[pending])
+        decimals[pending[found]] = d
+        scaled[pending[found]] = candidate[found]
+        pending = pending[~found & (candidate < MAX_SHORT_DIGITS)]
+    return decimals, scaled
+
+def decimal_cells(negative, scaled, decimals):
+    """Characters of sign, integer part, '.', and fraction of scaled / 10**decimals (decimals per value)."""
+    width = int(decimals.max(initial=0))
+    unit = POWERS_OF_TEN[decimals]
+    integer, digit_mask = digit_cells(scaled // unit)
+    # Left-align every fraction to `width` digits; the trailing zeros are masked off below
+    fraction_scaled = scaled % unit * POWERS_OF_TEN[width - decimals]
+    fraction, _ = digit_cells(fraction_scaled, width=max(width, 1))
+    trailing = np.sum(fraction_scaled[:, None] % POWERS_OF_TEN[1:max(width, 1) + 1] == 0, axis=1)
+    fraction_mask = np.arange(max(width, 1)) < np.maximum(max(width, 1) - trailing, 1)[:, None]
+    sign = np.full((len(scaled), 1), ord('-'), np.uint8)
+    point = np.full((len(scaled), 1), ord('.'), np.uint8)
+    chars = np.hstack([sign, integer, point, fraction])
+    mask = np.hstack([negative[:, None], digit_mask, np.ones_like(point, bool), fraction_mask])
+    return chars, mask
+
+def fast_cells(values, decimals):
+    """Byte matrix and mask for an integer column or a float column rounded to `decimals` places."""
+    if values.dtype.kind in 'iu':
+        negative = values < 0
+        digits, digit_mask = digit_cells(np.abs(values.astype(np.int64)))
+        sign = np.full((len(values), 1), ord('-'), np.uint8)
+        return np.hstack([sign, digits]), np.hstack([negative[:, None], digit_mask])
+
+    scaled = np.rint(np.abs(values) * 10.0**decimals).astype(np.int64)
+    unit = POWERS_OF_TEN[decimals]
+    integer, digit_mask = digit_cells(scaled // unit)
+    fraction, _ = digit_cells(scaled % unit, width=decimals)
+    # Keep the fraction up to its last non-zero digit, and always at least one digit ("1.0")
+    trailing = np.sum(scaled[:, None] % POWERS_OF_TEN[1:decimals + 1] == 0, axis=1)
+    fraction_mask = np.arange(decimals) < np.maximum(decimals - trailing, 1)[:, None]
+    sign = np.full((len(values), 1), ord('-'), np.uint8)
+    point = np.full((len(values), 1), ord('.'), np.uint8)
+    chars = np.hstack([sign, integer, point, fraction])
+    mask = np.hstack([np.signbit(values)[:, None], digit_mask, np.ones_like(point, bool), fraction_mask])
+    return chars, mask
+
+def column_cells(values, decimals):
+    if values.dtype.kind in 'iu':
+        return fast_cells(values, decimals)
+    if values.dtype.kind == 'f' and decimals is None:
+        places, scaled = shortest_decimals(values)
+        fast = places >= 0
+        if fast.all():
+            return decimal_cells(np.signbit(values), scaled, places)
+        return merge_cells(fast, decimal_cells(np.signbit(values[fast]), scaled[fast], places[fast]),
+                           repr_cells(values[~fast]))
+    if values.dtype.kind != 'f' or not 0 < decimals <= 9:
+        return repr_cells(values)
+
+    magnitude = np.abs(values)
+    fast = (magnitude == 0) | ((magnitude >= 1e-4) & (magnitude < 1e9))
+    if fast.all():
+        return fast_cells(values, decimals)
+    return merge_cells(fast, fast_cells(values[fast], decimals), repr_cells(values[~fast]))
+
+def merge_cells(fast, fast_part, slow_part):
+    """Combine the cells of the rows where `fast` is set with those of the other rows."""
+    (fast_chars, fast_mask), (slow_chars, slow_mask) = fast_part, slow_part
+    width = max(fast_chars.shape[1], slow_chars.shape[1])
+    chars = np.zeros((len(fast), width), np.uint8)
+    mask = np.zeros((len(fast), width), bool)
+    chars[fast, :fast_chars.shape[1]] = fast_chars
+    mask[fast, :fast_mask.shape[1]] = fast_mask
+    chars[~fast, :slow_chars.shape[1]] = slow_chars
+    mask[~fast, :slow_mask.shape[1]] = slow_mask
+    return chars, mask
+
+def quote_empty(chars, mask):
+    """Write empty cells (NaN) as '""', as csv does for a row whose only field is empty."""
+    empty = ~mask.any(axis=1)
+    if not empty.any():
+        return chars, mask
+    if chars.shape[1] < 2:
+        chars = np.hstack([chars, np.zeros((len(chars), 2 - chars.shape[1]), np.uint8)])
+        mask = np.hstack([mask, np.zeros((len(mask), 2 - mask.shape[1]), bool)])
+    chars[empty, :2] = ord('"')
+    mask[empty, :2] = True
+    return chars, mask
+
+def format_rows(columns, decimals=None):
+    """
+    Format a list of equal-length 1-D arrays as CSV lines (with trailing line ending).
+    decimals tells the fast path that float columns have already been rounded to that many places.
+    """
+    rows = len(columns[0])
+    if rows == 0:
+        return ''
+    separator = np.frombuffer(b',', np.uint8)
+    line_end = np.frombuffer(os.linesep.encode(), np.uint8)
+    chars, masks = [], []
+    for i, values in enumerate(columns):
+        cell_chars, cell_mask = column_cells(values, decimals)
+        if len(columns) == 1:
+            cell_chars, cell_mask = quote_empty(cell_chars, cell_mask)
+        chars.append(cell_chars)
+        masks.append(cell_mask)
+        delimiter = line_end if i == len(columns) - 1 else separator
+        chars.append(np.broadcast_to(delimiter, (rows, delimiter.size)))
+        masks.append(np.ones((rows, delimiter.size), bool))
+    chars = np.hstack(chars)
+    return chars[np.hstack(masks)].tobytes().decode('ascii')
+
+def format_header(names):
+    line = io.StringIO()
+    csv.writer(line, lineterminator=os.linesep).writerow([str(name) for name in names])
+    return line.getvalue()
+
+class CsvWriter:
+    """
+    Buffered CSV writer: write(columns) appends a block of rows, formatting it in chunks of
+    chunk_rows, optionally on a pool of workers (chunks are written back in order).
+    """
+
+    def __init__(self, output_filename, header=True, decimals=6, workers=None, executor=None,
+                 chunk_rows=None):
+        self.output_filename = output_filename
+        self.header = header
+        self.decimals = decimals
+        self.workers = WORKERS if workers is None else workers
+        self.executor_kind = EXECUTOR if executor is None else executor
+        self.chunk_rows = chunk_rows or CHUNK_ROWS
+        self.file = open(output_filename, 'w', newline='', buffering=BUFFER_BYTES)
+        self.pool = None
+        self.header_written = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def executor(self):
+        if self.pool is None:
+            pool_class = ProcessPoolExecutor if self.executor_kind == 'process' else ThreadPoolExecutor
+            self.pool = pool_class(max_workers=self.workers)
+        return self.pool
+
+    def write(self, columns):
+        names = list(columns)
+        arrays = [np.asarray(columns[name]) for name in names]
+        arrays = [values.astype(np.float64) if values.dtype.kind == 'f' and values.dtype != np.float64 else values
+                  for values in arrays]
+        if self.decimals is not None:
+            arrays = [np.round(values, self.decimals) for values in arrays]
+        if self.header and not self.header_written:
+            self.file.write(format_header(names))
+        self.header_written = True
+
+        rows = len(arrays[0])
+        chunks = ([values[start:start + self.chunk_rows] for values in arrays]
+                  for start in range(0, rows, self.chunk_rows))
+        decimals = [self.decimals] * ((rows + self.chunk_rows - 1) // self.chunk_rows)
+        if self.workers > 1 and rows > self.chunk_rows:
+            formatted = self.executor().map(format_rows, chunks, decimals)
+        else:
+            formatted = map(format_rows, chunks, decimals)
+        for text in formatted:
+            self.file.write(text)
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+        self.file.close()
+
+def check_roundtrip(rows=100_000, decimals=6, seed=0):
+    """
+    Compare format_rows with DataFrame.to_csv on random float64, float32 and integer columns
+    (float32 compared as float64), rounded and at full precision, and check that the float32
+    text reads back to within half a unit in the last decimal. Raises AssertionError on a mismatch.
+    """
+    import tempfile
+
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    magnitudes = 10.0 ** rng.uniform(-8, 8, rows)
+    columns = {
+        'float64': rng.standard_normal(rows) * magnitudes,
+        'float32': (rng.standard_normal(rows) * magnitudes).astype(np.float32),
+        'int': rng.integers(-10**6, 10**6, rows),
+    }
+    columns['float64'][::97] = np.nan
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, 'check.csv')
+        with CsvWriter(filename) as writer:
+            writer.write(columns)
+        with open(filename, newline='') as file:
+            text = file.read()
+
+    expected = pd.DataFrame({name: np.round(np.asarray(values, dtype=np.float64 if values.dtype.kind == 'f' else None),
+                                            decimals) for name, values in columns.items()})
+    assert text == expected.to_csv(index=False, lineterminator=os.linesep), "CSV text differs from pandas"
+    exact = columns['float32'].astype(np.float64)
+    read_back = pd.read_csv(io.StringIO(text))['float32'].values
+    # Half a unit in the last decimal, plus the float64 rounding of a value that sits on a tie
+    tolerance = 0.5 * 10.0**-decimals + 4 * np.spacing(np.abs(exact))
+    assert np.all(np.abs(read_back - exact) <= tolerance), "float32 values do not round-trip"
+
+    # Full precision (decimals=None): short and 17-digit values, alone (NaN rows are '""') and with ints
+    mixed = np.where(np.arange(rows) % 2, columns['float64'], np.round(columns['float64'], 3))
+    for block in ([mixed], [mixed, columns['int']]):
+        expected = pd.DataFrame(dict(enumerate(block))).to_csv(index=False, header=False, lineterminator=os.linesep)
+        assert format_rows(block) == expected, "full-precision CSV text differs from pandas"
+
+if __name__ == "__main__":
+    check_roundtrip()
+    print("CSV output matches pandas and float32 columns round-trip.")
@@ -1,23 +1,79 @@
 import numpy as np
-import pandas as pd
 import matplotlib.pyplot as plt
-from scipy.optimize import curve_fit
-import os
+from math import factorial
+
+from csv_loader import load_csv
+from plot_decimation import EnvelopeLine
 
 def load_data(filename):
-    df = pd.read_csv(filename)
+    df = load_csv(filename, header=True)
     return df
 
 def taylor_series(w, beta0, beta1, beta2, w0):
     return beta0 + beta1 * (w - w0) + 0.5 * beta2 * (w - w0)**2
 
+def taylor_polynomial(w, betas, w0):
+    """Taylor series of any order: sum of betas[n] / n! * (w - w0)**n."""
+    return sum(beta / factorial(n) * (w - w0)**n for n, beta in enumerate(betas))
+
+def fit_taylor_lstsq(x, y, order=2, weights=None):
+    """
+    Closed-form least-squares fit of the Taylor series about w0 = mean(x).
+    The model is linear in beta0..beta{order}, so this solves the (weighted) normal equations
+    directly instead of iterating like curve_fit, and gives the same coefficients and the same
+    covariance as curve_fit(..., sigma=1/sqrt(weights)).
+
+    y may be 1-D (bins) or 2-D (scans x bins) to fit every scan in one call; weights may be
+    None, 1-D (shared by all scans) or the same shape as y.
+    Returns betas (order+1, or scans x order+1), covariance ((order+1)^2, or per scan) and w0.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    single = y.ndim == 1
+    y = np.atleast_2d(y)
+    w = np.ones(x.size) if weights is None else np.asarray(weights, dtype=float)
+
+    w0 = x.mean()
+    dw = x - w0
+    # Fit in units of the largest offset to keep the normal equations well conditioned
+    scale = np.max(np.abs(dw)) or 1.0
+    powers = np.arange(order + 1)
+    inv_factorials = np.array([1 / factorial(n) for n in powers])
+    design = (dw[:, None] / scale) ** powers * inv_factorials
+
+    if w.ndim == 1:
+        # Weights shared by every scan: one normal matrix for the whole batch
+        normal_inv = np.linalg.inv(design.T @ (w[:, None] * design))
+        coeffs = (y * w) @ design @ normal_inv.T
+        normal_inv = normal_inv[None]
+    else:
+        w = np.broadcast_to(w, y.shape)
+        weighted_design = w[:, :, None] * design
+        normal_inv = np.linalg.inv(weighted_design.transpose(0, 2, 1) @ design)
+        rhs = (y[:, None, :] @ weighted_design)[:, 0, :]
+        coeffs = (normal_inv @ rhs[:, :, None])[:, :, 0]
+
+    residuals = y - coeffs @ design.T
+    dof = x.size - (order + 1)
+    if dof > 0:
+        chi2 = np.sum(w * residuals**2, axis=-1) / dof
+    else:
+        chi2 = np.full(y.shape[0], np.inf)
+    unscale = scale ** -powers
+    betas = coeffs * unscale
+    cov = normal_inv * chi2[:, None, None] * np.outer(unscale, unscale)
+
+    if single:
+        return betas[0], cov[0], w0
+    return betas, cov, w0
+
 def select_window(df, x_col, y_col):
     x = df[x_col].values
     y = np.unwrap(df[y_col].values)
     data_length = len(x)
 
     fig, ax = plt.subplots(figsize=(12, 6))
-    ax.plot(x, y, '-', linewidth=0.8, label='Unwrapped Phase')
+    EnvelopeLine(ax, x, y, '-', linewidth=0.8, label='Unwrapped Phase')
     ax.set_title("Click to select LEFT (green) and RIGHT (red) edges. Press Enter to confirm each.")
     ax.set_xlabel(x_col)
     ax.set_ylabel(y_col + " (unwrapped)")
@@ -64,28 +120,82 @@ def select_window(df, x_col, y_col):
         return None
 
     x_min, x_max = sorted([left_idx[0], right_idx[0]])
+    return apply_window(df, x_col, y_col, x_min, x_max)
+
+def detect_fit_band(x, power, threshold=0.1):
+    """
+    Headless counterpart of select_window: (x_min, x_max) of the contiguous band around the
+    power maximum where power stays at or above `threshold` x the maximum.
+    """
+    x = np.asarray(x)
+    power = np.asarray(power)
+    peak = int(np.argmax(power))
+    below = power < threshold * power[peak]
+    left = np.flatnonzero(below[:peak])
+    right = np.flatnonzero(below[peak:])
+    start = left[-1] + 1 if left.size else 0
+    end = peak + right[0] - 1 if right.size else len(power) - 1
+    return x[start], x[end]
+
+def apply_window(df, x_col, y_col, x_min, x_max):
+    """Keep rows with x_min <= x <= x_max and unwrap the phase column."""
     windowed_df = df[(df[x_col] >= x_min) & (df[x_col] <= x_max)].copy()
-    windowed_df[y_col] = np.unwrap(windowed_df[y_col].values)
+    # Unwrap in double precision even when the phase was computed in float32
+    windowed_df[y_col] = np.unwrap(windowed_df[y_col].values.astype(np.float64))
     print(f"Windowed range: {x_min:.2f} to {x_max:.2f}")
     return windowed_df
 
-def fit_phase_curve(df, x_col, y_col):
+def power_weights(power):
+    """Fit weights from the Power column (|X|): phase noise scales as 1/|X|, so weight by |X|^2."""
+    return np.asarray(power, dtype=float)**2
+
+def print_coefficients(betas, w0):
+    for n, beta in enumerate(betas):
+        print(f"Beta_{n}: {beta:.6f}")
+    print(f"w0 (center freq): {w0:.6f}")
+
+def fit_phase_curve(df, x_col, y_col, order=2, weight_col=None, return_cov=False):
+    """
+    Fit the Taylor series of the given order to the windowed phase.
+    weight_col='Power' weights each bin by its power (see power_weights).
+    Returns beta0..beta{order} and w0, plus the covariance matrix if return_cov is set.
+    """
     x = df[x_col].values
     y = df[y_col].values
-    w0 = x.mean()
-    popt, pcov = curve_fit(lambda w, b0, b1, b2: taylor_series(w, b0, b1, b2, w0), x, y)
-    beta0, beta1, beta2 = popt
+    weights = power_weights(df[weight_col].values) if weight_col is not None else None
+    betas, cov, w0 = fit_taylor_lstsq(x, y, order, weights)
     print("\nFitted Coefficients:")
-    print(f"Beta_0: {beta0:.6f}")
-    print(f"Beta_1: {beta1:.6f}")
-    print(f"Beta_2: {beta2:.6f}")
-    print(f"w0 (center freq): {w0:.6f}")
-    return beta0, beta1, beta2, w0
-
-def plot_fit(df, x_col, y_col, beta0, beta1, beta2, w0):
+    print_coefficients(betas, w0)
+    if return_cov:
+        return (*betas, w0, cov)
+    return (*betas, w0)
+
+def fit_phase_curve_batch(x, phases, x_min=None, x_max=None, order=2, power=None):
+    """
+    Fit the Taylor series to many phase spectra at once.
+    x is the shared 1-D bin axis and phases is (scans x bins); bins outside [x_min, x_max] are
+    dropped and each scan is unwrapped within the window, as in select_window. power (bins, or
+    scans x bins) turns on power weighting. All scans are solved in one vectorized call.
+    Returns beta0..beta{order} arrays with one entry per scan, and w0.
+    """
+    x = np.asarray(x)
+    phases = np.atleast_2d(phases)
+    keep = np.ones(x.size, dtype=bool)
+    if x_min is not None:
+        keep &= x >= x_min
+    if x_max is not None:
+        keep &= x <= x_max
+    y = np.unwrap(phases[:, keep].astype(np.float64), axis=-1)
+    weights = power_weights(np.asarray(power)[..., keep]) if power is not None else None
+    betas, _, w0 = fit_taylor_lstsq(x[keep], y, order, weights)
+    return (*betas.T, w0)
+
+def plot_fit(df, x_col, y_col, *fit):
+    """Plot the fit; fit is the (beta0, ..., beta{order}, w0) tuple from fit_phase_curve."""
+    *betas, w0 = fit
     x = df[x_col].values
     y = df[y_col].values
-    y_fit = taylor_series(x, beta0, beta1, beta2, w0)
+    y_fit = taylor_polynomial(x, betas, w0)
 
     plt.figure(figsize=(10, 5))
     plt.plot(x, y, label='Unwrapped Phase', marker='o', linestyle='-', alpha=0.6)
@@ -111,11 +221,22 @@ def main():
     x_col = df.columns[x_idx]
     y_col = df.columns[y_idx]
 
-    windowed_df = select_window(df, x_col, y_col)
+    if 'Power' in df.columns and input("Select the fit band automatically from Power? (Y/N): ").strip().upper() == 'Y':
+        threshold = float(input("Power threshold as a fraction of the peak (default 0.1): ") or 0.1)
+        x_min, x_max = detect_fit_band(df[x_col].values, df['Power'].values, threshold)
+        windowed_df = apply_window(df, x_col, y_col, x_min, x_max)
+    else:
+        windowed_df = select_window(df, x_col, y_col)
     if windowed_df is None:
         return
 
-    beta0, beta1, beta2, w0 = fit_phase_curve(windowed_df, x_col, y_col)
+    order = int(input("Taylor series order (2 = up to Beta_2, 4 = up to Beta_4): ") or 2)
+    weight_col = None
+    if 'Power' in df.columns:
+        if input("Weight the fit by the Power column? (Y/N): ").strip().upper() == 'Y':
+            weight_col = 'Power'
+
+    *betas, w0 = fit_phase_curve(windowed_df, x_col, y_col, order, weight_col)
 
     print("\nWould you like to view the fit?")
     print("A: Yes")
@@ -123,13 +244,10 @@ def main():
     view_fit = input("Enter choice (A/B): ").strip().upper()
 
     if view_fit == 'A':
-        plot_fit(windowed_df, x_col, y_col, beta0, beta1, beta2, w0)
+        plot_fit(windowed_df, x_col, y_col, *betas, w0)
 
     print("\nFitted Coefficients (repeated for reference):")
-    print(f"Beta_0: {beta0:.6f}")
-    print(f"Beta_1: {beta1:.6f}")
-    print(f"Beta_2: {beta2:.6f}")
-    print(f"w0 (center freq): {w0:.6f}")
+    print_coefficients(betas, w0)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,29 @@
+import numpy as np
+
+from interpolate import read_data
+from zero_crossing import find_zero_crossings, save_crossing_data
+
+def resample_at_crossings(reference_array, measure_array, mode='cubic'):
+    """
+    Find the zero-crossings of the raw reference signal with a local root solve and evaluate
+    the measurement at those times, without building an upsampled trace first.
+    Costs O(N + crossings) instead of O(N * factor).
+
+    Returns the same (original index, measurement, array index) triple as find_zero_crossings;
+    since no interpolated array exists, the array index is the fractional raw sample position.
+    """
+    if mode not in ('linear', 'cubic'):
+        raise ValueError(f"Unknown root solve {mode!r}, expected 'linear' or 'cubic'")
+    index = np.arange(reference_array.size, dtype=float)
+    return find_zero_crossings(reference_array, measure_array, index, mode)
+
+def main():
+    filename = input("Enter raw CSV file path: ").strip('"')
+    mode = input("Local root solve (linear/cubic, default cubic): ").strip().lower() or 'cubic'
+
+    measure_array, reference_array = read_data(filename)
+    original_idx_vals, meas_vals, array_indices = resample_at_crossings(reference_array, measure_array, mode)
+    save_crossing_data(filename, original_idx_vals, array_indices, meas_vals)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Shared FFT backend for FFT_analysis.py, IFFT_transform.py, windowing.py and spectrogram.py.
+
+Settings (module level, or through the environment before import):
+    WORKERS      number of threads per transform. DSP_FFT_WORKERS, default: all cores.
+                 Change at run time with set_workers(n).
+    PAD_FAST_LEN if True, transforms are zero-padded to scipy.fft.next_fast_len so lengths
+                 with large prime factors stay fast. This changes the output length (the
+                 spectrum is sampled more finely), so it is off by default.
+                 DSP_FFT_PAD_FAST_LEN=1 to enable.
+    BACKEND      'scipy' (default) or 'pyfftw'. pyfftw is optional; when it is not installed
+                 the scipy backend is used. DSP_FFT_BACKEND to choose.
+
+scipy's pocketfft keeps an internal cache of plans keyed by length, and the pyfftw backend
+has its plan cache enabled, so repeated same-length calls reuse their transform plans.
+"""
+import os
+from functools import lru_cache
+
+import numpy as np
+import scipy.fft
+
+WORKERS = int(os.environ.get('DSP_FFT_WORKERS', 0)) or os.cpu_count() or 1
+PAD_FAST_LEN = os.environ.get('DSP_FFT_PAD_FAST_LEN', '0') == '1'
+BACKEND = os.environ.get('DSP_FFT_BACKEND', 'scipy')
+
+if BACKEND == 'pyfftw':
+    try:
+        import pyfftw
+        import pyfftw.interfaces.scipy_fft
+        pyfftw.interfaces.cache.enable()
+        scipy.fft.set_global_backend(pyfftw.interfaces.scipy_fft)
+    except ImportError:
+        print("pyfftw is not installed — falling back to the scipy FFT backend.")
+        BACKEND = 'scipy'
+
+def set_workers(n):
+    """Set the number of threads used by every transform (-1 = all cores)."""
+    global WORKERS
+    WORKERS = os.cpu_count() if n == -1 else int(n)
+
+@lru_cache(maxsize=None)
+def fast_len(n):
+    return scipy.fft.next_fast_len(n)
+
+def transform_length(n, pad=None):
+    if pad is None:
+        pad = PAD_FAST_LEN
+    return fast_len(n) if pad else n
+
+def fft(x, axis=-1, pad=None):
+    x = np.asarray(x)
+    return scipy.fft.fft(x, n=transform_length(x.shape[axis], pad), axis=axis, workers=WORKERS)
+
+def ifft(x, axis=-1, pad=None):
+    x = np.asarray(x)
+    return scipy.fft.ifft(x, n=transform_length(x.shape[axis], pad), axis=axis, workers=WORKERS)
+
+def fftshift(x, axes=None):
+    return scipy.fft.fftshift(x, axes=axes)
+
+def ifftshift(x, axes=None):
+    return scipy.fft.ifftshift(x, axes=axes)
+
+def rfft(x, axis=-1, pad=None):
+    """Half-spectrum FFT of a real signal: bins 0..n//2 of fft(x)."""
+    x = np.asarray(x)
+    return scipy.fft.rfft(x, n=transform_length(x.shape[axis], pad), axis=axis, workers=WORKERS)
+
+def irfft(x, n, axis=-1):
+    return scipy.fft.irfft(x, n=n, axis=axis, workers=WORKERS)
+
+def hermitian_full(half, n):
+    """
+    Rebuild the full length-n spectrum of a real signal from its non-redundant half
+    (bins 0..n//2 along the last axis) using X[n-k] = conj(X[k]).
+    """
+    half = np.asarray(half)
+    k = np.arange(n)
+    full = half[..., np.minimum(k, n - k)]
+    return np.where(k > n // 2, np.conj(full), full)
@@ -1,52 +1,116 @@
 import numpy as np
-import pandas as pd
 import os
 from scipy.interpolate import interp1d
+from scipy.fft import rfft, irfft, next_fast_len
+from scipy.signal import resample_poly
 
-def read_data(filename):
+from csv_loader import load_csv
+from table_io import output_path, TableWriter
+
+INTERP_METHODS = ['cubic', 'fft', 'polyphase']
+
+def read_data(filename, dtype=None):
     """Reads CSV, auto-detects where numeric data starts, returns measurement and reference arrays."""
-    with open(filename, 'r') as file:
-        lines = file.readlines()
-
-    start_index = 0
-    for i, line in enumerate(lines):
-        try:
-            float(line.strip().split(',')[0])
-            start_index = i
-            break
-        except ValueError:
-            continue
-
-    df = pd.read_csv(filename, delimiter=",", usecols=[0,1], skiprows=start_index, header=None)
+    df = load_csv(filename, usecols=[0, 1], dtype=dtype)
     return df.iloc[:, 0].values, df.iloc[:, 1].values
 
-def interpolate_data(reference_array, measure_array, factor):
-    """Performs cubic interpolation with given factor."""
+def upsample_fft(array, factor):
+    """
+    Band-limited upsampling by FFT zero-padding. The signal is edge-padded to a length with
+    small prime factors and mirrored, so the periodic extension has no jump at the ends
+    (less edge ringing) and both transforms stay O(N log N) for any trace length.
+    """
+    n = array.size
+    padded = np.pad(array, (0, next_fast_len(n - 1) + 1 - n), mode='edge')
+    mirrored = np.concatenate([padded, padded[-2:0:-1]])
+    spectrum = rfft(mirrored)
+    # Split the Nyquist bin between +/- Nyquist once it is no longer the last bin
+    spectrum[-1] *= 0.5
+    upsampled = irfft(spectrum, mirrored.size * factor) * factor
+    return upsampled[:(n - 1) * factor + 1]
+
+def upsample_polyphase(array, factor):
+    """Band-limited upsampling with scipy's polyphase FIR resampler."""
+    n = array.size
+    upsampled = resample_poly(array, factor, 1, padtype='line')
+    return upsampled[:(n - 1) * factor + 1]
+
+def interpolate_data(reference_array, measure_array, factor, method="cubic"):
+    """
+    Performs interpolation with given factor using the cubic, fft or polyphase engine.
+    The interpolated signals keep the precision of the inputs (float32 stays float32); the
+    positions new_x are always float64.
+    """
+    dtype = np.result_type(reference_array, measure_array, np.float32)
     x = np.arange(reference_array.size)
     new_x = np.arange(0, reference_array.size - 1 + 1e-6, 1 / factor)
-    interp_ref = interp1d(x, reference_array, kind="cubic")(new_x)
-    interp_meas = interp1d(x, measure_array, kind="cubic")(new_x)
-    return new_x, interp_ref, interp_meas
+    if method == "cubic":
+        interp_ref = interp1d(x, reference_array, kind="cubic")(new_x)
+        interp_meas = interp1d(x, measure_array, kind="cubic")(new_x)
+    elif method == "fft":
+        interp_ref = upsample_fft(reference_array, factor)
+        interp_meas = upsample_fft(measure_array, factor)
+    elif method == "polyphase":
+        interp_ref = upsample_polyphase(reference_array, factor)
+        interp_meas = upsample_polyphase(measure_array, factor)
+    else:
+        raise ValueError(f"Unknown interpolation method {method!r}, expected one of {INTERP_METHODS}")
+    return new_x, interp_ref.astype(dtype, copy=False), interp_meas.astype(dtype, copy=False)
+
+def interpolate_data_chunked(reference_array, measure_array, factor, block_size=1_000_000, halo=32):
+    """
+    Streaming version of interpolate_data: yields (new_x, interp_ref, interp_meas) blocks of at
+    most block_size output points. Each block fits its cubic spline on the input samples it covers
+    plus `halo` extra samples on each side; the influence of the far-away knots on a not-a-knot
+    cubic spline decays by roughly 0.27 per sample, so the blocks match the whole-trace spline to
+    rounding error while memory stays proportional to block_size.
+    """
+    n = reference_array.size
+    step = 1 / factor
+    total = int(np.floor((n - 1 + 1e-6) / step)) + 1
+    for k0 in range(0, total, block_size):
+        k1 = min(k0 + block_size, total)
+        new_x = np.arange(k0, k1) * step
+        lo = max(int(np.floor(new_x[0])) - halo, 0)
+        hi = min(int(np.ceil(new_x[-1])) + halo + 1, n)
+        x = np.arange(lo, hi)
+        interp_ref = interp1d(x, reference_array[lo:hi], kind="cubic")(new_x)
+        interp_meas = interp1d(x, measure_array[lo:hi], kind="cubic")(new_x)
+        yield new_x, interp_ref, interp_meas
 
 def save_interpolated_data(original_filename, new_x, interp_ref, interp_meas, factor):
     """Saves interpolated data to new CSV with _interp{factor} suffix."""
+    return save_interpolated_blocks(original_filename, [(new_x, interp_ref, interp_meas)], factor)
+
+def save_interpolated_blocks(original_filename, blocks, factor):
+    """Writes an iterable of (new_x, interp_ref, interp_meas) blocks to the _interp{factor} file one block at a time."""
     base, ext = os.path.splitext(original_filename)
-    output_filename = f"{base}_interp{factor}{ext}"
-    df_out = pd.DataFrame({
-        "Index": np.round(new_x, 6),
-        "Interpolated Measurement": np.round(interp_meas, 6),
-        "Interpolated Reference": np.round(interp_ref, 6)
-    })
-    df_out.to_csv(output_filename, index=False)
+    output_filename = output_path(f"{base}_interp{factor}", ext)
+    with TableWriter(output_filename) as writer:
+        for new_x, interp_ref, interp_meas in blocks:
+            writer.write({
+                "Index": new_x,
+                "Interpolated Measurement": interp_meas,
+                "Interpolated Reference": interp_ref
+            })
     print(f"Saved interpolated data to {output_filename}")
+    return output_filename
 
 def main():
     filename = input("Enter CSV file path: ").strip('"')
     interp_factor = int(input("Interpolation factor (e.g., 10): ") or 10)
+    method = input(f"Interpolation method ({'/'.join(INTERP_METHODS)}, default cubic): ").strip().lower() or "cubic"
+    block_size = 0
+    if method == "cubic":
+        block_size = int(input("Output block size for streaming (0 = whole trace at once): ") or 0)
 
     measure_array, reference_array = read_data(filename)
-    new_x, interp_ref, interp_meas = interpolate_data(reference_array, measure_array, interp_factor)
-    save_interpolated_data(filename, new_x, interp_ref, interp_meas, interp_factor)
+    if block_size > 0:
+        blocks = interpolate_data_chunked(reference_array, measure_array, interp_factor, block_size)
+        save_interpolated_blocks(filename, blocks, interp_factor)
+    else:
+        new_x, interp_ref, interp_meas = interpolate_data(reference_array, measure_array, interp_factor, method)
+        save_interpolated_data(filename, new_x, interp_ref, interp_meas, interp_factor)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,79 @@
+import numpy as np
+import time
+
+from interpolate import read_data, interpolate_data, INTERP_METHODS
+from zero_crossing import find_zero_crossings
+
+def synthetic_signal(n, seed=0):
+    """
+    Band-limited test pair: a reference laser fringe and a measurement interferogram, both
+    given as functions so the exact value between samples is known.
+    """
+    rng = np.random.default_rng(seed)
+    freqs = rng.uniform(0.05, 0.35, 8)
+    phases = rng.uniform(0, 2 * np.pi, 8)
+    center = n / 2
+
+    def reference(t):
+        return np.cos(2 * np.pi * 0.21 * t)
+
+    def measurement(t):
+        envelope = np.exp(-((t - center) / (n / 8)) ** 2)
+        return envelope * np.sum(np.cos(2 * np.pi * freqs[:, None] * t + phases[:, None]), axis=0)
+
+    return reference, measurement
+
+def time_method(reference_array, measure_array, factor, method, repeats=3):
+    best = np.inf
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = interpolate_data(reference_array, measure_array, factor, method)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def compare(reference_array, measure_array, factor, truth=None):
+    """
+    Time every interpolation engine and report its error. With truth=(reference_fn, measurement_fn)
+    the error is against the exact band-limited signal, otherwise against the cubic engine.
+    """
+    rows = []
+    baseline = None
+    for method in INTERP_METHODS:
+        elapsed, (new_x, interp_ref, interp_meas) = time_method(reference_array, measure_array, factor, method)
+        if method == 'cubic':
+            baseline = (interp_ref, interp_meas)
+        if truth is not None:
+            target_ref, target_meas = truth[0](new_x), truth[1](new_x)
+        else:
+            target_ref, target_meas = baseline
+        # Ignore the first and last 2% where every engine is limited by its edge handling
+        edge = max(int(0.02 * new_x.size), 1)
+        interior = slice(edge, -edge)
+        ref_err = np.sqrt(np.mean((interp_ref[interior] - target_ref[interior]) ** 2))
+        meas_err = np.sqrt(np.mean((interp_meas[interior] - target_meas[interior]) ** 2))
+        crossings = len(find_zero_crossings(interp_ref, interp_meas, new_x)[0])
+        rows.append((method, elapsed, ref_err, meas_err, crossings))
+
+    against = "exact signal" if truth is not None else "cubic"
+    print(f"\n{'Method':<10} {'Time (s)':>10} {'Speedup':>8} {'RMS ref err':>12} {'RMS meas err':>13} {'Crossings':>10}")
+    print(f"(errors are against the {against}, interior only)")
+    cubic_time = rows[0][1]
+    for method, elapsed, ref_err, meas_err, crossings in rows:
+        print(f"{method:<10} {elapsed:>10.4f} {cubic_time / elapsed:>7.1f}x {ref_err:>12.2e} {meas_err:>13.2e} {crossings:>10}")
+    return rows
+
+def main():
+    filename = input("Enter raw CSV file path (blank = synthetic band-limited signal): ").strip('"')
+    factor = int(input("Interpolation factor (e.g., 10): ") or 10)
+
+    if filename:
+        measure_array, reference_array = read_data(filename)
+        compare(reference_array, measure_array, factor)
+    else:
+        n = int(input("Number of samples (e.g., 200000): ") or 200000)
+        reference, measurement = synthetic_signal(n)
+        t = np.arange(n)
+        compare(reference(t), measurement(t), factor, truth=(reference, measurement))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+import numpy as np
+
+from interpolate import read_data
+from zero_crossing import find_zero_crossings
+from IFFT_transform import save_ifft_output
+import fft_backend
+
+def reference_grid_positions(reference_array):
+    """
+    Fractional position of every raw sample on the reference-laser grid, where crossing j
+    of the reference sits at position j. Only samples between the first and last crossing
+    are kept. Returns (sample indices, positions, number of crossings).
+    """
+    index = np.arange(reference_array.size, dtype=float)
+    crossing_times, _, _ = find_zero_crossings(reference_array, reference_array, index, 'cubic')
+    inside = np.flatnonzero((index >= crossing_times[0]) & (index <= crossing_times[-1]))
+    positions = np.interp(index[inside], crossing_times, np.arange(crossing_times.size, dtype=float))
+    return inside, positions, crossing_times.size
+
+def nufft_type1(values, positions, n_out, oversampling=2, spread=12, chunk_size=1_000_000):
+    """
+    Gridding NUFFT: sum_j values[j] * exp(+2j*pi*k*positions[j]/n_out) for the n_out frequencies
+    k in np.fft order (0..n_out/2-1, then -n_out/2..-1), using Gaussian spreading onto an
+    oversampled grid (Greengard & Lee). O(N * spread + M log M) instead of O(N * M); the
+    default spread gives about 1e-12 relative accuracy. Spreading is done in chunks of
+    chunk_size samples to bound memory.
+    """
+    grid_size = int(oversampling * n_out)
+    tau = np.pi * spread / (n_out**2 * oversampling * (oversampling - 0.5))
+    grid = np.zeros(grid_size, dtype=complex)
+    values = np.asarray(values, dtype=complex)
+    offsets = np.arange(-spread + 1, spread + 1)
+
+    for start in range(0, values.size, chunk_size):
+        x = 2 * np.pi * (positions[start:start + chunk_size] % n_out) / n_out
+        nearest = np.floor(x * grid_size / (2 * np.pi)).astype(np.int64)
+        cols = nearest[:, None] + offsets[None, :]
+        distance = x[:, None] - 2 * np.pi * cols / grid_size
+        weights = np.exp(-distance**2 / (4 * tau)) * values[start:start + chunk_size, None]
+        cols %= grid_size
+        grid += np.bincount(cols.ravel(), weights=weights.real.ravel(), minlength=grid_size)
+        grid += 1j * np.bincount(cols.ravel(), weights=weights.imag.ravel(), minlength=grid_size)
+
+    # ifft gives the +i exponent and the 1/grid_size factor of the gridded sum
+    spectrum = fft_backend.ifft(grid, pad=False)
+    k = np.fft.fftfreq(n_out, 1 / n_out)
+    return np.sqrt(np.pi / tau) * np.exp(k**2 * tau) * spectrum[k.astype(np.int64) % grid_size]
+
+def perform_nufft_ifft_complex(measure_array, positions, n_out):
+    """
+    IFFT of a measurement sampled at non-uniform positions on the reference grid.
+    Each sample is weighted by its local spacing so the result matches np.fft.ifft of the
+    measurement resampled at the crossings.
+    """
+    spacing = np.gradient(positions) if positions.size > 1 else np.ones_like(positions)
+    return nufft_type1(measure_array * spacing, positions, n_out) / n_out
+
+def perform_nufft_ifft(measure_array, positions, n_out):
+    """perform_nufft_ifft_complex split into real, imaginary and magnitude like perform_ifft."""
+    transformed = perform_nufft_ifft_complex(measure_array, positions, n_out)
+    return np.real(transformed), np.imag(transformed), np.abs(transformed)
+
+def main():
+    filename = input("Enter raw CSV file path: ").strip('"')
+    measure_array, reference_array = read_data(filename)
+    inside, positions, n_crossings = reference_grid_positions(reference_array)
+    real, imag, magnitude = perform_nufft_ifft(measure_array[inside], positions, n_crossings)
+    save_ifft_output(filename, real, imag, magnitude)
+
+if __name__ == "__main__":
+    main()
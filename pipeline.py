@@ -0,0 +1,398 @@
+import numpy as np
+import pandas as pd
+import json
+import os
+
+import fft_backend
+from stage_cache import StageCache, file_digest
+from stage_graph import StageGraph, ValueStore, get_concurrently
+from truncating import load_data, save_truncated_data, can_copy_rows, truncate_by_offsets, detect_truncation
+from interpolate import interpolate_data, save_interpolated_data
+from zero_crossing import find_zero_crossings, save_crossing_data
+from direct_crossing import resample_at_crossings
+from nufft_transform import reference_grid_positions, perform_nufft_ifft_complex
+from IFFT_transform import perform_ifft_complex, save_ifft_output
+from windowing import save_masked_data, detect_windows
+from FFT_analysis import compute_fft, compute_fft_real, save_fft_output
+from curve_fit_phase import fit_taylor_lstsq, power_weights, print_coefficients, detect_fit_band
+from signals import RawTrace, CrossingSeries, ComplexSpectrum, PhaseSpectrum
+
+STAGES = ['truncate', 'interpolate', 'zero_crossing', 'ifft', 'window', 'fft', 'fit']
+# Stages with an intermediate file (see Pipeline.save_stage); the fit is returned, not saved
+SAVEABLE_STAGES = STAGES[:-1]
+
+IFFT_COLUMNS = ['IFFT Real', 'IFFT Imag', 'IFFT Magnitude']
+
+# Part of every stage key: bump when the type of a stage's result changes, so old cache entries are not reused
+STAGE_VERSION = 2
+
+# Pipeline settings taken by each stage function
+STAGE_PARAMS = {
+    'truncate': ['truncation_range', 'truncation_threshold'],
+    'interpolate': ['interp_factor', 'interp_method'],
+    'zero_crossing': ['crossing_mode'],
+    'window': ['window_ranges', 'num_windows', 'window_width', 'window_dc_guard', 'window_taper', 'window_alpha'],
+    'fft': ['fft_mode'],
+    'fit': ['fit_range', 'fit_threshold', 'fit_order', 'fit_weight_col'],
+}
+
+def truncate_stage(df, truncation_range=None, truncation_threshold=0.1, dtype=None):
+    """(RawTrace in dtype, (start, end) or None); 'auto' detects the range with detect_truncation."""
+    trace = RawTrace.from_frame(df, dtype)
+    if truncation_range == 'auto':
+        bounds = detect_truncation(trace.measurement, truncation_threshold)
+    elif truncation_range is None:
+        return trace, None
+    else:
+        bounds = tuple(sorted(truncation_range))
+    return trace.truncate(*bounds), bounds
+
+def interpolate_stage(truncated, interp_factor=10, interp_method='cubic'):
+    trace, _ = truncated
+    return interpolate_data(trace.reference, trace.measurement, interp_factor, interp_method)
+
+def crossing_stage(interpolated, crossing_mode='nearest', interp_factor=None):
+    new_x, interp_ref, interp_meas = interpolated
+    return CrossingSeries(*find_zero_crossings(interp_ref, interp_meas, new_x, crossing_mode), interp_factor, crossing_mode)
+
+def direct_crossing_stage(truncated, crossing_mode='cubic'):
+    trace, _ = truncated
+    return CrossingSeries(*resample_at_crossings(trace.reference, trace.measurement, crossing_mode), 1, crossing_mode)
+
+def ifft_stage(crossings):
+    return ComplexSpectrum(perform_ifft_complex(crossings.measurement))
+
+def nufft_stage(truncated):
+    trace, _ = truncated
+    inside, positions, n_crossings = reference_grid_positions(trace.reference)
+    transformed = perform_nufft_ifft_complex(trace.measurement[inside], positions, n_crossings)
+    return ComplexSpectrum(transformed.astype(np.result_type(trace.measurement, np.complex64), copy=False))
+
+def window_stage(spectrum, window_ranges=None, num_windows=1, window_width=None, window_dc_guard=0,
+                 window_taper='none', window_alpha=None):
+    """Window the IFFT output (see windowing.window_weights); returns the windowed spectrum and the ranges used."""
+    if window_ranges == 'auto':
+        df = pd.DataFrame(dict(zip(IFFT_COLUMNS, (spectrum.real, spectrum.imag, spectrum.magnitude))), copy=False)
+        window_ranges, _ = detect_windows(df, 'IFFT Magnitude', num_windows, window_width,
+                                          dc_guard=window_dc_guard)
+    if not window_ranges:
+        return spectrum, window_ranges
+    return spectrum.windowed(window_ranges, window_taper, window_alpha), window_ranges
+
+def fft_stage(windowed, fft_mode='A'):
+    """PhaseSpectrum of the signal selected by fft_mode."""
+    spectrum, _ = windowed
+    signal = spectrum.signal(fft_mode)
+    if fft_mode == 'A':
+        return PhaseSpectrum(*compute_fft(signal))
+    # Modes B/C/D are real-valued: keep only the non-redundant half spectrum
+    return PhaseSpectrum(*compute_fft_real(signal))
+
+def fit_bounds(power, fit_range=None, fit_threshold=0.1):
+    if fit_range == 'auto':
+        return detect_fit_band(np.arange(len(power)), power, fit_threshold)
+    if fit_range is None:
+        return 0, len(power) - 1
+    return tuple(sorted(fit_range))
+
+def fit_stage(spectrum, fit_range=None, fit_threshold=0.1, fit_order=2, fit_weight_col=None):
+    """
+    ((beta0, ..., w0), (x_min, x_max)) of the Taylor fit over the fit band, as curve_fit_phase's
+    apply_window + fit_phase_curve but on slices of the spectrum instead of a copied frame.
+    """
+    bounds = fit_bounds(spectrum.power, fit_range, fit_threshold)
+    band = spectrum.band(*bounds)
+    columns = spectrum.columns()
+    weights = power_weights(columns[fit_weight_col][band]) if fit_weight_col is not None else None
+    # Unwrap and fit in double precision whatever the precision of the spectrum
+    phase = np.unwrap(spectrum.phase[band].astype(np.float64))
+    betas, _, w0 = fit_taylor_lstsq(spectrum.bins[band], phase, fit_order, weights)
+    print("\nFitted Coefficients:")
+    print_coefficients(betas, w0)
+    return (*betas, w0), bounds
+
+class Pipeline:
+    """
+    Run truncation -> interpolation -> zero crossing -> IFFT -> windowing -> FFT -> phase fit
+    in memory, passing NumPy arrays from one stage to the next.
+
+    Intermediate CSVs are only written for the stages listed in save_stages, using the same
+    suffixes the standalone scripts produce (_truncated, _interp{factor}, _zc, _ifft, _zeroedout, _fft).
+
+    interp_method='direct' skips the upsampling stage and resamples the raw measurement at the
+    reference zero-crossings (see direct_crossing.py). interp_method='nufft' skips both upsampling
+    and zero-crossing resampling and transforms the raw samples directly (see nufft_transform.py).
+
+    truncation_range, window_ranges and fit_range may be 'auto' to run unattended: the ranges are
+    then found by detect_truncation (measurement envelope above truncation_threshold x peak),
+    detect_windows (num_windows strongest IFFT Magnitude peaks at least window_dc_guard bins from
+    DC, window_width samples wide or their half-height width) and detect_fit_band (Power above fit_threshold x peak), and are
+    reported in results['ranges']. window_taper ('none', 'tukey', 'hann' or 'gaussian', with
+    window_alpha) smooths the window edges instead of zeroing hard.
+
+    dtype='float32' runs the signal stages in single precision: the capture is loaded as
+    float32 and interpolation, zero crossings, IFFT, windowing and FFT keep it (complex64
+    spectra), halving memory and bandwidth. Sample positions, phase unwrapping and the Taylor
+    fit stay in float64, and the nufft gridding runs in double precision and is cast back.
+    See precision_report.py to check the coefficients against float64 for a set of captures.
+
+    The stages are evaluated through a StageGraph (see graph()), so only the stages a result
+    depends on are run. cache_dir turns on the on-disk stage cache (see stage_cache.py):
+    re-running with different window, FFT or fit settings then reuses the cached
+    interpolation, zero crossings and IFFT. compare() runs several variants of the settings,
+    sharing the stages they have in common.
+    """
+
+    def __init__(self, truncation_range=None, interp_factor=10, interp_method='cubic', crossing_mode='nearest',
+                 window_ranges=None, fft_mode='A', fit_range=None, fit_order=2, fit_weight_col=None,
+                 save_stages=(), truncation_threshold=0.1, num_windows=1, window_width=None, window_dc_guard=0,
+                 fit_threshold=0.1, cache_dir=None, window_taper='none', window_alpha=None, dtype='float64'):
+        unknown = set(save_stages) - set(SAVEABLE_STAGES)
+        if unknown:
+            raise ValueError(f"Stage(s) in save_stages that cannot be saved: {sorted(unknown)} "
+                             f"(choose from {', '.join(SAVEABLE_STAGES)})")
+        self.truncation_range = truncation_range
+        self.interp_factor = interp_factor
+        self.interp_method = interp_method
+        self.crossing_mode = crossing_mode
+        self.window_ranges = window_ranges
+        self.fft_mode = fft_mode
+        self.fit_range = fit_range
+        self.fit_order = fit_order
+        self.fit_weight_col = fit_weight_col
+        self.save_stages = set(save_stages)
+        self.truncation_threshold = truncation_threshold
+        self.num_windows = num_windows
+        self.window_width = window_width
+        self.window_dc_guard = window_dc_guard
+        self.window_taper = window_taper
+        self.window_alpha = window_alpha
+        self.fit_threshold = fit_threshold
+        self.cache_dir = cache_dir
+        self.dtype = np.dtype(dtype).name
+        self.cache = StageCache(cache_dir) if cache_dir else None
+        self.results = {}
+
+    def settings(self):
+        """Keyword arguments that recreate this pipeline."""
+        settings = {name: getattr(self, name) for names in STAGE_PARAMS.values() for name in names}
+        settings.update(save_stages=sorted(self.save_stages), cache_dir=self.cache_dir, dtype=self.dtype)
+        return settings
+
+    def stage_params(self, name):
+        return {param: getattr(self, param) for param in STAGE_PARAMS.get(name, [])}
+
+    def ifft(self, signal):
+        return ComplexSpectrum(perform_ifft_complex(np.asarray(signal, self.dtype)))
+
+    def window(self, spectrum):
+        """Window a ComplexSpectrum; returns the windowed spectrum and the ranges used."""
+        return window_stage(spectrum, **self.stage_params('window'))
+
+    def fft(self, windowed):
+        return fft_stage((windowed, None), self.fft_mode)
+
+    def fit_bounds(self, power):
+        return fit_bounds(power, self.fit_range, self.fit_threshold)
+
+    def fit(self, spectrum, bounds=None):
+        bounds = bounds if bounds is not None else self.fit_bounds(spectrum.power)
+        fit, _ = fit_stage(spectrum, bounds, fit_order=self.fit_order, fit_weight_col=self.fit_weight_col)
+        return fit
+
+    def graph(self, filename, df=None, store=None):
+        """
+        The stage graph for one capture. df is the already-loaded capture, if any. Graphs built
+        with the same store (e.g. by compare) share every stage whose key matches.
+        """
+        # With an on-disk cache the capture is identified by its contents, otherwise by its file
+        if self.cache is not None:
+            identity = file_digest(filename)
+        else:
+            stat = os.stat(filename)
+            identity = (os.path.abspath(filename), stat.st_size, stat.st_mtime_ns)
+
+        def capture(filename, identity):
+            return df if df is not None else load_data(filename, dtype=self.dtype)
+
+        graph = StageGraph(self.cache, store, context=(fft_backend.PAD_FAST_LEN, STAGE_VERSION))
+        graph.add('capture', capture, params={'filename': filename, 'identity': identity}, persist=False)
+        graph.add('truncate', truncate_stage, ['capture'], {**self.stage_params('truncate'), 'dtype': self.dtype})
+        if self.interp_method == 'nufft':
+            graph.add('ifft', nufft_stage, ['truncate'])
+        else:
+            if self.interp_method == 'direct':
+                mode = 'cubic' if self.crossing_mode == 'nearest' else self.crossing_mode
+                graph.add('zero_crossing', direct_crossing_stage, ['truncate'], {'crossing_mode': mode})
+            else:
+                graph.add('interpolate', interpolate_stage, ['truncate'], self.stage_params('interpolate'))
+                graph.add('zero_crossing', crossing_stage, ['interpolate'],
+                          {**self.stage_params('zero_crossing'), 'interp_factor': self.interp_factor})
+            graph.add('ifft', ifft_stage, ['zero_crossing'])
+        graph.add('window', window_stage, ['ifft'], self.stage_params('window'))
+        graph.add('fft', fft_stage, ['window'], self.stage_params('fft'))
+        graph.add('fit', fit_stage, ['fft'], self.stage_params('fit'))
+        return graph
+
+    def run(self, filename, df=None):
+        """
+        Run every stage on a raw capture and return a dict of per-stage results.
+        df is the already-loaded capture, if the caller read it ahead of time.
+
+        Stages are pulled from the fit backwards, so with a cache a stage whose result is cached
+        skips every stage before it; results (and results['ranges']) then only hold the stages
+        that were computed or fetched, plus the fit.
+        """
+        graph = self.graph(filename, df)
+        graph.get('fit')
+        for name in SAVEABLE_STAGES:
+            if name in self.save_stages and name in graph.stages:
+                self.save_stage(name, graph.get(name), filename)
+        self.results = stage_results(graph)
+        return self.results
+
+    def compare(self, filename, variants, workers=None, df=None):
+        """
+        Run variants of this pipeline on one capture, each a dict of settings to change (for
+        example candidate window_ranges, or fft_mode 'A'/'B'/'C'). The variants share every
+        stage before the first one they change, and independent stages run concurrently on
+        `workers` threads. Returns the results dict of each variant.
+        """
+        store = ValueStore()
+        settings = self.settings()
+        graphs = [Pipeline(**{**settings, **variant, 'save_stages': ()}).graph(filename, df, store)
+                  for variant in variants]
+        get_concurrently([(graph, 'fit') for graph in graphs], workers)
+        return [stage_results(graph) for graph in graphs]
+
+    def stage_inputs(self, filename):
+        """File name each stage's save function is given, following the standalone scripts' suffixes."""
+        base, ext = os.path.splitext(filename)
+        inputs = {'truncate': filename}
+        if self.truncation_range is not None:
+            base = f"{base}_truncated"
+        if self.interp_method not in ('nufft', 'direct'):
+            inputs['interpolate'] = f"{base}{ext}"
+            base = f"{base}_interp{self.interp_factor}"
+        if self.interp_method != 'nufft':
+            inputs['zero_crossing'] = f"{base}{ext}"
+            base = f"{base}_zc"
+        inputs['ifft'] = f"{base}.csv"
+        base = f"{base}_ifft"
+        inputs['window'] = f"{base}.csv"
+        inputs['fft'] = f"{base}_zeroedout.csv"
+        return inputs
+
+    def save_stage(self, name, value, filename):
+        """Write one stage's result the way its standalone script does."""
+        input_filename = self.stage_inputs(filename)[name]
+        if name == 'truncate':
+            trace, bounds = value
+            if bounds is None:
+                return
+            if can_copy_rows(filename):
+                truncate_by_offsets(filename, *bounds)
+            else:
+                save_truncated_data(filename, pd.DataFrame(trace.columns(), copy=False))
+        elif name == 'interpolate':
+            new_x, interp_ref, interp_meas = value
+            save_interpolated_data(input_filename, new_x, interp_ref, interp_meas, self.interp_factor)
+        elif name == 'zero_crossing':
+            save_crossing_data(input_filename, value.original_index, value.interpolated_index, value.measurement)
+        elif name == 'ifft':
+            save_ifft_output(input_filename, value.real, value.imag, value.magnitude)
+        elif name == 'window':
+            save_masked_data(input_filename, pd.DataFrame(value[0].columns(), copy=False))
+        elif name == 'fft':
+            save_fft_output(input_filename, value.power, value.phase, value.full_length)
+
+def stage_results(graph):
+    """Results dict of the stages the graph has evaluated, in the form Pipeline.run returns."""
+    results = {'ranges': {}}
+    values = {name: graph.get(name) for name in graph.stages if name != 'capture' and graph.computed(name)}
+    if 'truncate' in values:
+        results['truncate'], results['ranges']['truncate'] = values['truncate']
+    for name in ('interpolate', 'zero_crossing', 'ifft'):
+        if name in values:
+            results[name] = values[name]
+    if 'window' in values:
+        results['window'], results['ranges']['window'] = values['window']
+    if 'fft' in values:
+        results['fft'] = values['fft']
+    results['fit'], results['ranges']['fit'] = values['fit']
+    return results
+
+def parse_ranges(text):
+    """Parse '10-20, 80-90' into [(10, 20), (80, 90)]."""
+    ranges = []
+    for part in text.split(','):
+        part = part.strip()
+        if part:
+            start, end = part.split('-')
+            ranges.append((int(start), int(end)))
+    return ranges
+
+def parse_range_setting(text):
+    """parse_ranges, or 'auto' to have the range detected."""
+    return 'auto' if text.strip().lower() == 'auto' else parse_ranges(text)
+
+def save_settings(filename, settings):
+    """Save Pipeline keyword arguments as JSON so the same run can be repeated (see batch_runner.py)."""
+    with open(filename, 'w') as file:
+        json.dump(settings, file, indent=4)
+
+def load_settings(filename):
+    with open(filename) as file:
+        return json.load(file)
+
+def prompt_settings():
+    """Ask for the Pipeline settings and return them as keyword arguments."""
+    truncation = parse_range_setting(input("Truncation range as start-end (auto = detect, blank = keep all): "))
+    interp_factor = int(input("Interpolation factor (e.g., 10): ") or 10)
+    interp_method = input("Interpolation method (cubic/fft/polyphase/direct/nufft, default cubic): ").strip().lower() or 'cubic'
+    crossing_mode = input("Crossing estimate (nearest/linear/cubic, default nearest): ").strip().lower() or 'nearest'
+    window_ranges = parse_range_setting(input("IFFT window ranges as start-end, comma separated "
+                                              "(auto = detect, blank = no windowing): "))
+    num_windows, dc_guard = 1, 0
+    if window_ranges == 'auto':
+        num_windows = int(input("Number of windows to detect (default 1): ") or 1)
+        dc_guard = int(input("Ignore peaks within this many bins of DC (default 0): ") or 0)
+    taper = 'none'
+    if window_ranges:
+        taper = input("Window taper (none/tukey/hann/gaussian, default none): ").strip().lower() or 'none'
+    fft_mode = (input("FFT input mode (A/B/C/D): ").strip().upper() or 'A')
+    fit_range = parse_range_setting(input("Phase fit bin range as start-end (auto = detect, blank = all bins): "))
+    print(f"Stages: {', '.join(SAVEABLE_STAGES)}")
+    save_stages = [s.strip() for s in input("Stages to save to CSV, comma separated (blank = none): ").split(',') if s.strip()]
+    cache_dir = input("Stage cache directory (blank = no caching): ").strip('"') or None
+    dtype = input("Precision (float64/float32, default float64): ").strip().lower() or 'float64'
+
+    return dict(
+        truncation_range=truncation if truncation == 'auto' else (truncation[0] if truncation else None),
+        interp_factor=interp_factor,
+        interp_method=interp_method,
+        crossing_mode=crossing_mode,
+        window_ranges=window_ranges,
+        fft_mode=fft_mode,
+        fit_range=fit_range if fit_range == 'auto' else (fit_range[0] if fit_range else None),
+        save_stages=save_stages,
+        num_windows=num_windows,
+        window_dc_guard=dc_guard,
+        window_taper=taper,
+        cache_dir=cache_dir,
+        dtype=dtype,
+    )
+
+def main():
+    filename = input("Enter raw CSV file path: ").strip('"')
+    settings = prompt_settings()
+    settings_file = input("Save these settings to (blank = don't save): ").strip('"')
+    if settings_file:
+        save_settings(settings_file, settings)
+    pipeline = Pipeline(**settings)
+    pipeline.run(filename)
+    if pipeline.cache is not None:
+        pipeline.cache.print_stats()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Min/max envelope decimation for the interactive selection plots (truncating, windowing and the
+phase-fit window). Only ~2 points per screen pixel are drawn, and the envelope is rebuilt for
+the visible range on every zoom or pan, so full detail comes back as you zoom in.
+"""
+import numpy as np
+
+def minmax_envelope(x, y, start, stop, n_bins):
+    """
+    Decimate y[start:stop] to at most ~2 * n_bins points by keeping the minimum and the
+    maximum of each bin, in index order. Unlike y[::step], every peak and dip survives,
+    however long the trace.
+    """
+    n = stop - start
+    if n <= 2 * n_bins:
+        return x[start:stop], y[start:stop]
+
+    size = -(-n // n_bins)
+    full_bins = n // size
+    end = start + full_bins * size
+    blocks = y[start:end].reshape(full_bins, size)
+    offsets = start + np.arange(full_bins)[:, None] * size
+    lo = np.argmin(blocks, axis=1)[:, None]
+    hi = np.argmax(blocks, axis=1)[:, None]
+    # Emit each bin's two extremes in the order they occur
+    order = np.sort(np.hstack([lo, hi]), axis=1)
+    indices = (offsets + order).ravel()
+    if end < stop:
+        tail = y[end:stop]
+        indices = np.concatenate([indices, end + np.sort([np.argmin(tail), np.argmax(tail)])])
+    return x[indices], y[indices]
+
+class EnvelopeLine:
+    """
+    A line on `ax` that shows the min/max envelope of (x, y) at roughly one bin per screen
+    pixel, recomputed for the visible range whenever the x-limits change (zoom / pan).
+    x must be increasing; clicks still report data coordinates as usual.
+    """
+
+    def __init__(self, ax, x, y, *args, **kwargs):
+        self.ax = ax
+        self.x = np.asarray(x)
+        self.y = np.asarray(y)
+        xs, ys = minmax_envelope(self.x, self.y, 0, len(self.y), self.pixels())
+        self.line, = ax.plot(xs, ys, *args, **kwargs)
+        # ax.callbacks only holds a weak reference to self.update; the line keeps this object
+        # alive for as long as it is on the axes, so callers don't have to
+        self.line.envelope = self
+        ax.callbacks.connect('xlim_changed', self.update)
+
+    def pixels(self):
+        return max(int(self.ax.bbox.width), 200)
+
+    def update(self, ax):
+        left, right = ax.get_xlim()
+        start = max(int(np.searchsorted(self.x, left, side='left')) - 1, 0)
+        stop = min(int(np.searchsorted(self.x, right, side='right')) + 1, len(self.x))
+        xs, ys = minmax_envelope(self.x, self.y, start, stop, self.pixels())
+        self.line.set_data(xs, ys)
+        ax.figure.canvas.draw_idle()
@@ -0,0 +1,85 @@
+"""
+Compare the phase-fit coefficients of the float64 and float32 pipelines (Pipeline(dtype=...))
+on a set of captures, to check that single precision is accurate enough for them before a
+batch job uses it. Each file is run once per precision, without the stage cache, so the
+reported times compare the computation itself (loading is not timed). The number of zero
+crossings of each run is reported too: a reference sample within rounding error of zero can
+add or lose a crossing in float32, which shifts the resampled signal and shows up as a
+larger difference in the coefficients.
+"""
+import glob
+import os
+import time
+from contextlib import redirect_stdout
+
+import numpy as np
+import pandas as pd
+
+from pipeline import Pipeline, load_settings, prompt_settings
+from truncating import load_data
+
+PRECISIONS = ['float64', 'float32']
+
+def timed_fit(settings, filename, dtype):
+    """(fit coefficients, seconds, number of crossings or None) of one pipeline run in the given precision."""
+    pipeline = Pipeline(**{**settings, 'dtype': dtype, 'save_stages': (), 'cache_dir': None})
+    df = load_data(filename, dtype=dtype)
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        start = time.perf_counter()
+        results = pipeline.run(filename, df)
+        elapsed = time.perf_counter() - start
+    crossings = len(results['zero_crossing']) if 'zero_crossing' in results else None
+    return results['fit'], elapsed, crossings
+
+def precision_report(pattern, settings):
+    """
+    One row per file and coefficient (Beta_0.., w0) with the float64 and float32 values, their
+    absolute and relative difference, and the run time and crossing count of each precision
+    for that file.
+    """
+    filenames = sorted(glob.glob(pattern)) if isinstance(pattern, str) else list(pattern)
+    if not filenames:
+        raise ValueError(f"No files match {pattern!r}")
+    rows = []
+    for filename in filenames:
+        (double_fit, double_time, double_crossings), (single_fit, single_time, single_crossings) = [
+            timed_fit(settings, filename, dtype) for dtype in PRECISIONS]
+        names = [f"Beta_{n}" for n in range(len(double_fit) - 1)] + ['w0']
+        for name, double, single in zip(names, double_fit, single_fit):
+            difference = abs(float(single) - float(double))
+            rows.append({
+                'File': filename,
+                'Coefficient': name,
+                'float64': float(double),
+                'float32': float(single),
+                'Abs Difference': difference,
+                'Rel Difference': difference / abs(float(double)) if double else np.nan,
+                'float64 Time (s)': double_time,
+                'float32 Time (s)': single_time,
+                'float64 Crossings': double_crossings,
+                'float32 Crossings': single_crossings,
+            })
+    return pd.DataFrame(rows)
+
+def main():
+    pattern = input("Enter a glob pattern for the raw CSV files (e.g., captures/*.csv): ").strip('"')
+    settings_file = input("Pipeline settings file (blank = enter the settings now): ").strip('"')
+    settings = load_settings(settings_file) if settings_file else prompt_settings()
+    output_filename = input("Report CSV file (default precision_report.csv): ").strip('"') or "precision_report.csv"
+
+    report = precision_report(pattern, settings)
+    report.to_csv(output_filename, index=False)
+    print(report.to_string(index=False))
+
+    print("\nLargest relative difference per coefficient:")
+    print(report.groupby('Coefficient', sort=False)['Rel Difference'].max().to_string())
+    times = report.drop_duplicates('File')[['float64 Time (s)', 'float32 Time (s)']].sum()
+    print(f"\nTotal time: float64 {times.iloc[0]:.2f} s, float32 {times.iloc[1]:.2f} s")
+    crossings = report.drop_duplicates('File')[['float64 Crossings', 'float32 Crossings']].dropna()
+    changed = (crossings['float64 Crossings'] != crossings['float32 Crossings']).sum()
+    if changed:
+        print(f"{changed} file(s) found a different number of zero crossings in float32, see the Crossings columns.")
+    print(f"Report saved as: {output_filename}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Array containers passed between the pipeline stages.
+
+Each container holds contiguous NumPy arrays plus the metadata the next stage needs, in
+__slots__, so it costs no more than its arrays. Truncation and windowing return views:
+a truncated RawTrace slices the capture's columns, and a windowed ComplexSpectrum shares the
+IFFT output it was taken from and applies the (cached, read-only) window weights only when a
+signal is read out of it. columns() gives the column layout the standalone scripts save.
+"""
+import numpy as np
+
+from windowing import window_weights
+
+class RawTrace:
+    """Measurement and reference samples of a capture; start is the offset of sample 0 in the file."""
+    __slots__ = ('measurement', 'reference', 'start')
+
+    def __init__(self, measurement, reference, start=0):
+        self.measurement = measurement
+        self.reference = reference
+        self.start = start
+
+    @classmethod
+    def from_frame(cls, df, dtype=None):
+        """Views of the first two columns of a loaded capture (copies if they have to be converted to dtype)."""
+        return cls(df.iloc[:, 0].to_numpy(dtype), df.iloc[:, 1].to_numpy(dtype))
+
+    def __len__(self):
+        return len(self.measurement)
+
+    def truncate(self, start, end):
+        """Samples start..end (inclusive) as views of this trace."""
+        return RawTrace(self.measurement[start:end + 1], self.reference[start:end + 1], self.start + start)
+
+    def columns(self):
+        return {0: self.measurement, 1: self.reference}
+
+class CrossingSeries:
+    """Measurement resampled at the reference zero-crossings (see find_zero_crossings)."""
+    __slots__ = ('original_index', 'measurement', 'interpolated_index', 'interp_factor', 'mode')
+
+    def __init__(self, original_index, measurement, interpolated_index, interp_factor=None, mode='nearest'):
+        self.original_index = original_index
+        self.measurement = measurement
+        self.interpolated_index = interpolated_index
+        self.interp_factor = interp_factor
+        self.mode = mode
+
+    def __len__(self):
+        return len(self.measurement)
+
+    def columns(self):
+        return {
+            "Original Index": np.asarray(self.original_index)[:len(self.interpolated_index)],
+            "Interpolated Array Index": self.interpolated_index,
+            "Measurement at Zero-Crossing": self.measurement
+        }
+
+class ComplexSpectrum:
+    """
+    Complex IFFT output in unshifted bin order, optionally windowed. A windowed spectrum shares
+    `values` with the spectrum it came from; window_ranges, taper and alpha describe the window.
+    """
+    __slots__ = ('values', 'window_ranges', 'taper', 'alpha', 'weights')
+
+    def __init__(self, values, window_ranges=None, taper='none', alpha=None):
+        self.values = values
+        self.window_ranges = window_ranges
+        self.taper = taper
+        self.alpha = alpha
+        self.weights = None
+        if window_ranges is not None:
+            self.weights = window_weights(len(values), window_ranges, taper, alpha, values.real.dtype)
+
+    def __len__(self):
+        return len(self.values)
+
+    @property
+    def real(self):
+        return self.values.real
+
+    @property
+    def imag(self):
+        return self.values.imag
+
+    @property
+    def magnitude(self):
+        return np.abs(self.values)
+
+    def windowed(self, window_ranges, taper='none', alpha=None):
+        """This spectrum with a window; no samples are copied."""
+        return ComplexSpectrum(self.values, window_ranges, taper, alpha)
+
+    def apply_window(self, x):
+        """x (values or one of their components) with the window applied, as windowing.apply_mask_inplace does."""
+        if self.weights is None:
+            return x
+        if self.taper == 'none':
+            return np.where(self.weights > 0, x, 0)
+        return x * self.weights
+
+    def signal(self, mode='A'):
+        """FFT input for mode A (complex), B (real), C (imag) or D (magnitude), windowed."""
+        if mode == 'A':
+            return self.apply_window(self.values)
+        if mode == 'B':
+            return self.apply_window(self.real)
+        if mode == 'C':
+            return self.apply_window(self.imag)
+        if mode == 'D':
+            return self.apply_window(self.magnitude)
+        raise ValueError(f"Invalid FFT input mode: {mode!r}")
+
+    def columns(self):
+        return {
+            'IFFT Real': self.apply_window(self.real),
+            'IFFT Imag': self.apply_window(self.imag),
+            'IFFT Magnitude': self.apply_window(self.magnitude)
+        }
+
+class PhaseSpectrum:
+    """
+    FFT power and phase at `bins` (default 0..n-1). full_length is set for a half spectrum
+    of a real signal (bins 0..full_length//2).
+    """
+    __slots__ = ('power', 'phase', 'bins', 'full_length')
+
+    def __init__(self, power, phase, full_length=None, bins=None):
+        self.power = power
+        self.phase = phase
+        self.full_length = full_length
+        self.bins = np.arange(len(power)) if bins is None else bins
+
+    def __len__(self):
+        return len(self.power)
+
+    def band(self, x_min, x_max):
+        """Slice of the bins with x_min <= bin <= x_max (bins are ascending)."""
+        return slice(np.searchsorted(self.bins, x_min, 'left'), np.searchsorted(self.bins, x_max, 'right'))
+
+    def columns(self):
+        return {'FFT Bin': self.bins, 'Power': self.power, 'Phase': self.phase}
@@ -0,0 +1,142 @@
+"""
+Short-time FFT (spectrogram) of a long interferogram, as an alternative to a single FFT.
+
+The signal is the 'Measurement at Zero-Crossing' column of a _zc file, or the IFFT columns of
+an _ifft file picked with the same A/B/C/D input modes as FFT_analysis.py. Frames of
+frame_length samples start every hop samples; they are a strided view of the signal, not
+copies. Frames are tapered (windowing.TAPERS) and transformed chunk_frames at a time with one
+batched FFT per chunk, and each chunk is written out before the next is computed, so memory
+stays at about one chunk however long the input is. With .npy inputs (table_io) the signal
+itself is memory-mapped as well.
+
+The output table has one row per frame and bin: Frame, Frame Start, FFT Bin, Power, Phase.
+Real inputs (a _zc file, or modes B/C/D) store only bins 0..frame_length//2.
+"""
+import os
+
+import numpy as np
+import matplotlib.pyplot as plt
+
+import fft_backend
+from FFT_analysis import IFFT_COLUMNS, select_signal
+from csv_loader import load_csv
+from table_io import TableWriter, output_path
+from windowing import TAPERS, window_weights
+
+CROSSING_COLUMN = 'Measurement at Zero-Crossing'
+CHUNK_FRAMES = 256
+MAX_PLOT_FRAMES = 2000
+
+def load_data(filename):
+    # The zero-crossing measurements of a _zc file, or the IFFT columns of an _ifft file
+    return load_csv(filename, header=True,
+                    usecols=lambda col: col in IFFT_COLUMNS or col in ('Full Length', CROSSING_COLUMN))
+
+def select_stft_signal(df, choice='A'):
+    """Signal to analyse: the zero-crossing measurements if present, else select_signal(df, choice)."""
+    if CROSSING_COLUMN in df.columns:
+        return df[CROSSING_COLUMN].values
+    return select_signal(df, choice)
+
+def check_framing(frame_length, hop):
+    if frame_length < 1:
+        raise ValueError(f"Frame length must be at least 1 sample, got {frame_length}")
+    if hop < 1:
+        raise ValueError(f"Hop between frames must be at least 1 sample, got {hop}")
+
+def frame_count(n, frame_length, hop):
+    check_framing(frame_length, hop)
+    return max((n - frame_length) // hop + 1, 0)
+
+def frame_view(signal, frame_length, hop):
+    """(frames x frame_length) read-only view of the overlapped frames; no samples are copied."""
+    check_framing(frame_length, hop)
+    if frame_length > len(signal):
+        raise ValueError(f"Frame length {frame_length} is longer than the signal ({len(signal)} samples)")
+    return np.lib.stride_tricks.sliding_window_view(signal, frame_length)[::hop]
+
+def stft_chunks(signal, frame_length, hop, taper='hann', alpha=None, chunk_frames=CHUNK_FRAMES):
+    """
+    Yield (first frame number, complex spectra) for chunk_frames frames at a time. Real signals
+    use rfft, so each row holds bins 0..frame_length//2.
+    """
+    signal = np.asarray(signal)
+    frames = frame_view(signal, frame_length, hop)
+    weights = window_weights(frame_length, [(0, frame_length - 1)], taper, alpha, signal.real.dtype)
+    transform = fft_backend.fft if np.iscomplexobj(signal) else fft_backend.rfft
+    for first in range(0, len(frames), chunk_frames):
+        # The multiply makes the only copy: one chunk of tapered frames
+        yield first, transform(frames[first:first + chunk_frames] * weights, axis=-1)
+
+def save_stft_output(filename, signal, frame_length, hop, taper='hann', alpha=None,
+                     chunk_frames=CHUNK_FRAMES, keep_every=0):
+    """
+    Write the STFT of `signal` chunk by chunk. If keep_every is set, the power of every
+    keep_every-th frame is also returned (frame numbers, power rows) for plotting.
+    """
+    base, ext = os.path.splitext(filename)
+    output_filename = output_path(f"{base}_stft", ".csv")
+    kept_frames, kept_power = [], []
+    with TableWriter(output_filename) as writer:
+        for first, spectra in stft_chunks(signal, frame_length, hop, taper, alpha, chunk_frames):
+            frames, bins = spectra.shape
+            frame = np.arange(first, first + frames)
+            power = np.abs(spectra)
+            writer.write({
+                'Frame': np.repeat(frame, bins),
+                'Frame Start': np.repeat(frame * hop, bins),
+                'FFT Bin': np.tile(np.arange(bins), frames),
+                'Power': power.ravel(),
+                'Phase': np.angle(spectra).ravel()
+            })
+            if keep_every:
+                keep = frame % keep_every == 0
+                kept_frames.append(frame[keep])
+                kept_power.append(power[keep])
+    print(f"STFT results saved to: {output_filename}")
+    if not keep_every:
+        return output_filename, None, None
+    return output_filename, np.concatenate(kept_frames), np.concatenate(kept_power)
+
+def plot_spectrogram(frame_starts, power):
+    plt.figure(figsize=(12, 6))
+    extent = [frame_starts[0], frame_starts[-1], 0, power.shape[1]]
+    plt.imshow(power.T, aspect='auto', origin='lower', extent=extent, interpolation='nearest')
+    plt.colorbar(label='Power')
+    plt.title("Short-Time FFT Power")
+    plt.xlabel("Frame Start (sample)")
+    plt.ylabel("FFT Bin")
+    plt.tight_layout()
+    plt.show()
+
+def main():
+    filename = input("Enter _zc or _ifft file path: ").strip('"')
+    df = load_data(filename)
+    choice = 'A'
+    if CROSSING_COLUMN not in df.columns:
+        print("\nFFT Input Modes: A = IFFT Real + Imag (complex), B = Real only, C = Imag only, D = Magnitude")
+        choice = input("Enter choice (A/B/C/D): ").strip().upper()
+    signal = select_stft_signal(df, choice)
+    if signal is None:
+        return
+
+    frame_length = int(input(f"Frame length in samples (signal has {len(signal)}): "))
+    default_hop = max(frame_length // 2, 1)
+    hop = int(input(f"Hop between frames (default {default_hop}): ") or default_hop)
+    check_framing(frame_length, hop)
+    taper = input(f"Frame taper {TAPERS} (default hann): ").strip().lower() or 'hann'
+    if taper not in TAPERS:
+        print(f"Unknown taper '{taper}', using hann.")
+        taper = 'hann'
+    n_frames = frame_count(len(signal), frame_length, hop)
+    print(f"{n_frames} frames of {frame_length} samples.")
+
+    show_plot = input("Plot the spectrogram? (Y/N): ").strip().upper() == 'Y'
+    keep_every = -(-n_frames // MAX_PLOT_FRAMES) if show_plot else 0
+    _, frames, power = save_stft_output(filename, signal, frame_length, hop, taper, keep_every=keep_every)
+
+    if show_plot and len(frames):
+        plot_spectrogram(frames * hop, power)
+
+if __name__ == "__main__":
+    main()
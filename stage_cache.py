@@ -0,0 +1,132 @@
+"""
+On-disk cache of pipeline stage results (see Pipeline(cache_dir=...)).
+
+A stage's key is a hash of its parameters chained with the key of the stage that feeds it; the
+first stage is keyed on a hash of the capture's contents. Changing a parameter therefore only
+changes the keys of that stage and the ones after it, and everything upstream is found in the
+cache. Entries are pickled to <key>.pkl; when the directory grows past max_bytes the least
+recently used entries are deleted. The Pipeline folds pipeline.STAGE_VERSION (and the FFT
+padding setting) into every key, so bumping STAGE_VERSION when a stage's result changes makes
+the old entries unreachable; they are then evicted like any other unused entry.
+
+Settings (module level, or through the environment before import):
+    CACHE_DIR   default directory (DSP_CACHE_DIR, default .dsp_cache)
+    MAX_BYTES   size limit (DSP_CACHE_MAX_BYTES, default 4 GB)
+"""
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+from collections import Counter
+
+CACHE_DIR = os.environ.get('DSP_CACHE_DIR', '.dsp_cache')
+MAX_BYTES = int(os.environ.get('DSP_CACHE_MAX_BYTES', 4 * 1024**3))
+HASH_BLOCK_BYTES = 16 * 1024 * 1024
+
+def file_digest(filename):
+    """Hex digest of a file's contents."""
+    digest = hashlib.blake2b(digest_size=20)
+    with open(filename, 'rb') as file:
+        while block := file.read(HASH_BLOCK_BYTES):
+            digest.update(block)
+    return digest.hexdigest()
+
+def stage_key(*parts):
+    """Key from a parent key and parameters; lists and tuples of the same values give the same key."""
+    text = json.dumps(parts, sort_keys=True, default=repr)
+    return hashlib.blake2b(text.encode(), digest_size=20).hexdigest()
+
+class StageCache:
+    """
+    Directory of pickled stage results with LRU eviction. fetch(stage, key, compute) returns the
+    cached value or computes and stores it; hits and misses are counted per stage name.
+    """
+
+    def __init__(self, directory=None, max_bytes=None):
+        self.directory = directory or CACHE_DIR
+        self.max_bytes = MAX_BYTES if max_bytes is None else max_bytes
+        os.makedirs(self.directory, exist_ok=True)
+        self.hits = Counter()
+        self.misses = Counter()
+        self.evictions = 0
+
+    def path(self, key):
+        return os.path.join(self.directory, f"{key}.pkl")
+
+    def get(self, key):
+        """(True, value) on a hit, (False, None) on a miss. A hit marks the entry as recently used."""
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as file:
+                value = pickle.load(file)
+            os.utime(path)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            return False, None
+        return True, value
+
+    def put(self, key, value):
+        # Write to a temporary file and rename, so other processes never see a partial entry
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as file:
+            pickle.dump(value, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, self.path(key))
+        self.evict()
+
+    def fetch(self, stage, key, compute):
+        hit, value = self.get(key)
+        if hit:
+            self.hits[stage] += 1
+            return value
+        self.misses[stage] += 1
+        value = compute()
+        self.put(key, value)
+        return value
+
+    def entries(self):
+        """(mtime, size, path) of every entry, least recently used first."""
+        found = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.pkl'):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                found.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        return sorted(found)
+
+    def evict(self):
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                self.evictions += 1
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def clear(self):
+        for _, _, path in self.entries():
+            os.remove(path)
+
+    def stats(self):
+        entries = self.entries()
+        return {
+            'hits': sum(self.hits.values()),
+            'misses': sum(self.misses.values()),
+            'evictions': self.evictions,
+            'entries': len(entries),
+            'bytes': sum(size for _, size, _ in entries),
+            'per_stage': {stage: (self.hits[stage], self.misses[stage])
+                          for stage in sorted(set(self.hits) | set(self.misses))},
+        }
+
+    def print_stats(self):
+        stats = self.stats()
+        print(f"\nStage cache ({self.directory}): {stats['hits']} hits, {stats['misses']} misses, "
+              f"{stats['evictions']} evicted, {stats['entries']} entries, {stats['bytes'] / 1e6:.1f} MB")
+        for stage, (hits, misses) in stats['per_stage'].items():
+            print(f"  {stage}: {hits} hits, {misses} misses")
@@ -0,0 +1,388 @@
+"""
+Live processing of (measurement, reference) sample pairs while the instrument is acquiring.
+
+A reader thread pulls blocks from a source (simulator, pipe, socket or growing CSV file) into a
+RingBuffer. The main thread takes blocks out of the ring, finds the reference zero-crossings
+incrementally (CrossingTracker, using find_zero_crossings on the raw samples like
+direct_crossing.py), and every time a scan of scan_samples samples is complete, runs its
+crossings through the Pipeline's IFFT -> window -> FFT -> fit stages.
+
+If processing falls behind, the ring overwrites its oldest unread samples; those samples and
+any scan they belonged to are counted as dropped. The ring keeps the arrival time of every
+write, so scan latency is measured from the arrival of the write that delivered the first
+sample after the scan to the end of its fit, however far behind the processing is.
+"""
+import io
+import os
+import socket
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import redirect_stdout
+
+import numpy as np
+
+from csv_loader import is_numeric_row
+from pipeline import Pipeline, load_settings, parse_range_setting
+from zero_crossing import find_zero_crossings
+
+READ_BYTES = 64 * 1024
+
+class RingBuffer:
+    """
+    Fixed-capacity buffer of (samples x channels) rows shared by one writer and one reader.
+    Samples are numbered from 0 in arrival order; when the writer laps the reader, the oldest
+    unread samples are overwritten and counted in `dropped`. `arrivals` holds (end sample
+    number, arrival time) of each write that still has unread samples.
+    """
+
+    def __init__(self, capacity, channels=2, dtype=np.float64):
+        self.data = np.zeros((capacity, channels), dtype=dtype)
+        self.capacity = capacity
+        self.written = 0
+        self.read_pos = 0
+        self.dropped = 0
+        self.arrivals = deque()
+        self.closed = False
+        self.condition = threading.Condition()
+
+    def write(self, block):
+        block = np.asarray(block)
+        with self.condition:
+            if len(block) > self.capacity:
+                skipped = len(block) - self.capacity
+                self.written += skipped
+                block = block[skipped:]
+            n = len(block)
+            start = self.written % self.capacity
+            first = min(n, self.capacity - start)
+            self.data[start:start + first] = block[:first]
+            self.data[:n - first] = block[first:]
+            self.written += n
+            if self.written - self.read_pos > self.capacity:
+                lost = self.written - self.capacity - self.read_pos
+                self.dropped += lost
+                self.read_pos += lost
+            self.arrivals.append((self.written, time.perf_counter()))
+            self.forget_read_writes()
+            self.condition.notify()
+
+    def forget_read_writes(self):
+        while self.arrivals and self.arrivals[0][0] <= self.read_pos:
+            self.arrivals.popleft()
+
+    def read(self, max_rows, timeout=None):
+        """
+        (first sample number, copy of up to max_rows rows, [(end sample number, arrival time)] of
+        the writes the rows came from), waiting for data if none is available. Returns None once
+        the buffer is closed and drained.
+        """
+        with self.condition:
+            self.condition.wait_for(lambda: self.written > self.read_pos or self.closed, timeout)
+            n = min(self.written - self.read_pos, max_rows)
+            if n == 0:
+                return None if self.closed else (self.read_pos, self.data[:0].copy(), [])
+            start = self.read_pos % self.capacity
+            first = min(n, self.capacity - start)
+            block = np.concatenate([self.data[start:start + first], self.data[:n - first]])
+            position = self.read_pos
+            self.read_pos += n
+            arrivals = []
+            for end, arrival in self.arrivals:
+                arrivals.append((end, arrival))
+                if end >= self.read_pos:
+                    break
+            self.forget_read_writes()
+            return position, block, arrivals
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+class CrossingTracker:
+    """
+    Reference zero-crossings found block by block. Each push reports the crossings that are
+    complete, as global sample positions and measurement values; a crossing next to the end of
+    the block waits for the samples after it (the cubic root solve uses i-1..i+2).
+    """
+
+    def __init__(self, mode='linear'):
+        if mode not in ('linear', 'cubic'):
+            raise ValueError(f"Unknown root solve {mode!r}, expected 'linear' or 'cubic'")
+        self.mode = mode
+        self.reset(0)
+
+    def reset(self, position):
+        """Forget the carried samples, e.g. after a gap; crossings restart at `position`."""
+        self.carry = np.zeros((0, 2))
+        self.carry_start = position
+        self.next_segment = position
+
+    def push(self, position, block, final=False):
+        if self.carry_start + len(self.carry) != position:
+            self.reset(position)
+        samples = np.concatenate([self.carry, block])
+        offset = self.carry_start
+        # Segment i (between samples i and i+1) is complete once sample i+2 is available
+        last = len(samples) - 2 if final else len(samples) - 3
+
+        found = np.empty(0), np.empty(0)
+        if last >= self.next_segment - offset and len(samples) >= 2:
+            measurement, reference = samples[:, 0], samples[:, 1]
+            segments = np.flatnonzero(np.diff(np.sign(reference)))
+            keep = (segments >= self.next_segment - offset) & (segments <= last)
+            if keep.any():
+                index = np.arange(offset, offset + len(samples), dtype=float)
+                positions, values, _ = find_zero_crossings(reference, measurement, index, self.mode)
+                found = positions[keep], values[keep]
+            self.next_segment = offset + last + 1
+
+        self.carry = samples[-3:]
+        self.carry_start = offset + len(samples) - len(self.carry)
+        return found
+
+class StreamProcessor:
+    """
+    Cut the crossing stream into scans of scan_samples samples and run each complete scan
+    through pipeline.ifft -> window -> fft -> fit. The pipeline's truncation_range, if set, is
+    taken as a sample range within each scan; interpolation settings are not used.
+    """
+
+    def __init__(self, pipeline, scan_samples, crossing_mode='linear', on_scan=None):
+        if pipeline.truncation_range == 'auto':
+            raise ValueError("Streaming needs a fixed truncation range (or none), not 'auto'")
+        self.pipeline = pipeline
+        self.scan_samples = scan_samples
+        self.tracker = CrossingTracker(crossing_mode)
+        self.on_scan = on_scan or print_scan
+        self.positions = np.empty(0)
+        self.values = np.empty(0)
+        self.next_scan = 0
+        self.expected = 0
+        self.scans_processed = 0
+        self.scans_dropped = 0
+        self.latencies = []
+        self.arrivals = deque()
+
+    def push(self, position, block, arrivals, final=False):
+        """Process `block`, starting at sample `position`; arrivals as returned by RingBuffer.read."""
+        for end, arrival in arrivals:
+            # A write split over two reads is reported by both
+            if not self.arrivals or end > self.arrivals[-1][0]:
+                self.arrivals.append((end, arrival))
+        if position != self.expected:
+            # Samples were lost: the scans they touched are incomplete
+            first_intact = -(-position // self.scan_samples)
+            self.scans_dropped += first_intact - self.next_scan
+            self.next_scan = first_intact
+            self.positions = np.empty(0)
+            self.values = np.empty(0)
+        self.expected = position + len(block)
+
+        positions, values = self.tracker.push(position, block, final)
+        self.positions = np.concatenate([self.positions, positions])
+        self.values = np.concatenate([self.values, values])
+
+        # A scan is complete once every segment up to its last sample has been searched
+        while True:
+            scan_end = (self.next_scan + 1) * self.scan_samples
+            if self.tracker.next_segment < scan_end and not (final and self.expected >= scan_end):
+                break
+            self.finish_scan()
+
+    def arrival(self, sample):
+        """Arrival time of the write that delivered `sample` (the last write, if the stream ended first)."""
+        for end, arrival in self.arrivals:
+            if end > sample:
+                return arrival
+        return self.arrivals[-1][1]
+
+    def finish_scan(self):
+        scan_start = self.next_scan * self.scan_samples
+        scan_end = scan_start + self.scan_samples
+        arrival = self.arrival(scan_end)
+        while len(self.arrivals) > 1 and self.arrivals[0][0] <= scan_end:
+            self.arrivals.popleft()
+        in_scan = self.positions < scan_end
+        # Crossings before the scan start belong to a scan cut short by a gap
+        keep = in_scan & (self.positions >= scan_start)
+        positions = self.positions[keep] - scan_start
+        values = self.values[keep]
+        self.positions = self.positions[~in_scan]
+        self.values = self.values[~in_scan]
+        if self.pipeline.truncation_range is not None:
+            start, end = sorted(self.pipeline.truncation_range)
+            values = values[(positions >= start) & (positions <= end)]
+
+        if len(values) >= 8:
+            result = self.process_scan(values)
+            latency = time.perf_counter() - arrival
+            self.latencies.append(latency)
+            self.scans_processed += 1
+            self.on_scan(self.next_scan, result, latency)
+        else:
+            self.scans_dropped += 1
+        self.next_scan += 1
+
+    def process_scan(self, meas_vals):
+        pipeline = self.pipeline
+        with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+            windowed, window_ranges = pipeline.window(pipeline.ifft(meas_vals))
+            spectrum = pipeline.fft(windowed)
+            bounds = pipeline.fit_bounds(spectrum.power)
+            fit = pipeline.fit(spectrum, bounds)
+        return {'crossings': len(meas_vals), 'window': window_ranges, 'fit_range': bounds, 'fit': fit}
+
+    def report(self, ring=None):
+        latencies = np.array(self.latencies) * 1e3
+        print(f"\nScans processed: {self.scans_processed}, dropped: {self.scans_dropped}")
+        if ring is not None:
+            print(f"Samples received: {ring.written}, dropped: {ring.dropped}")
+        if latencies.size:
+            print(f"Scan latency (ms): mean {latencies.mean():.2f}, "
+                  f"95th percentile {np.percentile(latencies, 95):.2f}, max {latencies.max():.2f}")
+
+def print_scan(scan, result, latency):
+    *betas, w0 = result['fit']
+    coefficients = ", ".join(f"Beta_{n} = {beta:.6g}" for n, beta in enumerate(betas))
+    print(f"Scan {scan}: {coefficients}, w0 = {w0:.2f} ({result['crossings']} crossings, "
+          f"{latency * 1e3:.1f} ms)")
+
+def parse_stream(chunks):
+    """
+    (rows x 2) arrays of measurement, reference from an iterable of CSV text chunks (bytes).
+    Lines before the first numeric row are skipped as a header, as in csv_loader.
+    """
+    partial = b''
+    in_header = True
+    for chunk in chunks:
+        lines = (partial + chunk).split(b'\n')
+        partial = lines.pop()
+        if in_header:
+            while lines and not is_numeric_row(lines[0].decode(errors='replace')):
+                lines.pop(0)
+            in_header = not lines
+        lines = [line for line in lines if line.strip()]
+        if lines:
+            yield np.loadtxt(io.BytesIO(b'\n'.join(lines)), delimiter=',', usecols=(0, 1), ndmin=2)
+
+def read_pipe(stream=None, read_bytes=READ_BYTES):
+    """Blocks from a binary stream such as a pipe on stdin, until it is closed."""
+    stream = stream or sys.stdin.buffer
+    yield from parse_stream(iter(lambda: stream.read1(read_bytes), b''))
+
+def read_socket(address, read_bytes=READ_BYTES):
+    """Blocks from a TCP connection to 'host:port' sending CSV lines, until it is closed."""
+    host, port = address.rsplit(':', 1)
+    with socket.create_connection((host, int(port))) as connection, connection.makefile('rb') as stream:
+        yield from read_pipe(stream, read_bytes)
+
+def follow_file(filename, poll_interval=0.05, idle_timeout=5.0, read_bytes=READ_BYTES):
+    """Blocks from a CSV file that is still being written; stops after idle_timeout s without growth."""
+    def chunks():
+        with open(filename, 'rb') as file:
+            idle_since = time.perf_counter()
+            while True:
+                chunk = file.read(read_bytes)
+                if chunk:
+                    idle_since = time.perf_counter()
+                    yield chunk
+                elif time.perf_counter() - idle_since > idle_timeout:
+                    return
+                else:
+                    time.sleep(poll_interval)
+    yield from parse_stream(chunks())
+
+def simulate(n_scans=20, scan_samples=100_000, rate=2e6, block_rows=4096, ref_freq=0.01,
+             meas_freq=0.003, beta2=1e-9, drift=0.05, noise=1e-3, seed=0):
+    """
+    Synthetic acquisition: a continuous reference sinusoid and one chirped interferogram burst
+    per scan, delivered in blocks of block_rows at `rate` samples per second (None = no pacing).
+    The chirp changes by `drift` (relative) from scan to scan.
+    """
+    rng = np.random.default_rng(seed)
+    t = np.arange(scan_samples)
+    centre = scan_samples / 2
+    envelope = np.exp(-((t - centre) / (scan_samples / 6))**2)
+    start_time = time.perf_counter()
+    sent = 0
+    for scan in range(n_scans):
+        chirp = beta2 * (1 + drift * scan) * (t - centre)**2
+        measurement = 0.5 + envelope * np.cos(2 * np.pi * meas_freq * t + chirp)
+        measurement += noise * rng.standard_normal(scan_samples)
+        reference = np.sin(2 * np.pi * ref_freq * (t + scan * scan_samples))
+        samples = np.column_stack([measurement, reference])
+        for start in range(0, scan_samples, block_rows):
+            if rate:
+                delay = start_time + sent / rate - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            block = samples[start:start + block_rows]
+            sent += len(block)
+            yield block
+
+def run_stream(source, processor, capacity=1 << 22, read_rows=1 << 16):
+    """Read `source` into a ring buffer on a background thread and process it until it ends."""
+    ring = RingBuffer(capacity)
+
+    def reader():
+        try:
+            for block in source:
+                ring.write(block)
+        finally:
+            ring.close()
+
+    thread = threading.Thread(target=reader, daemon=True)
+    thread.start()
+    while True:
+        item = ring.read(read_rows)
+        if item is None:
+            break
+        position, block, arrivals = item
+        if len(block):
+            processor.push(position, block, arrivals)
+    thread.join()
+    # The stream has ended: the crossings held back for lack of following samples are final now
+    processor.push(processor.expected, np.zeros((0, 2)), [], final=True)
+    processor.report(ring)
+    return processor
+
+def main():
+    print("Sources: S = simulator, F = growing CSV file, P = pipe on stdin, T = TCP socket")
+    choice = input("Choose a source (S/F/P/T): ").strip().upper() or 'S'
+    scan_samples = int(input("Samples per scan (default 100000): ") or 100_000)
+    if choice == 'F':
+        source = follow_file(input("CSV file path: ").strip('"'))
+    elif choice == 'P':
+        source = read_pipe()
+    elif choice == 'T':
+        source = read_socket(input("Address as host:port: ").strip())
+    else:
+        n_scans = int(input("Number of simulated scans (default 20): ") or 20)
+        source = simulate(n_scans, scan_samples)
+
+    settings_file = input("Pipeline settings file (blank = enter window/FFT/fit settings now): ").strip('"')
+    if settings_file:
+        settings = load_settings(settings_file)
+    else:
+        window_ranges = parse_range_setting(input("IFFT window ranges as start-end, comma separated "
+                                                  "(auto = detect, blank = no windowing): "))
+        dc_guard = 0
+        if window_ranges == 'auto':
+            dc_guard = int(input("Ignore peaks within this many bins of DC (default 0): ") or 0)
+        taper = 'none'
+        if window_ranges:
+            taper = input("Window taper (none/tukey/hann/gaussian, default none): ").strip().lower() or 'none'
+        fft_mode = input("FFT input mode (A/B/C/D): ").strip().upper() or 'A'
+        fit_range = parse_range_setting(input("Phase fit bin range as start-end (auto = detect, blank = all bins): "))
+        settings = dict(window_ranges=window_ranges, window_dc_guard=dc_guard, window_taper=taper, fft_mode=fft_mode,
+                        fit_range=fit_range if fit_range == 'auto' else (fit_range[0] if fit_range else None))
+    crossing_mode = input("Crossing estimate (linear/cubic, default linear): ").strip().lower() or 'linear'
+
+    processor = StreamProcessor(Pipeline(**settings), scan_samples, crossing_mode)
+    run_stream(source, processor)
+
+if __name__ == "__main__":
+    main()
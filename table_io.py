@@ -0,0 +1,117 @@
+"""
+Output side of the pipeline files: every save_* function writes through save_table / TableWriter.
+
+OUTPUT_FORMAT (DSP_OUTPUT_FORMAT, or set_output_format) picks the format of new files:
+    'csv'  text, values rounded to 6 decimals (the historical format)
+    'npy'  binary .npy structured array, one named field per column at full precision.
+           The loaders recognise it from its magic bytes and memory-map it instead of parsing.
+File names keep the usual suffixes (_interp{factor}, _zc, _ifft, ...); only the extension changes.
+"""
+import os
+
+import numpy as np
+
+from csv_writer import CsvWriter
+
+OUTPUT_FORMAT = os.environ.get('DSP_OUTPUT_FORMAT', 'csv')
+NPY_MAGIC = b'\x93NUMPY'
+# Fixed header size for streamed .npy files, so the final row count can be patched in place
+STREAM_HEADER_BYTES = 1024
+
+def set_output_format(output_format):
+    global OUTPUT_FORMAT
+    if output_format not in ('csv', 'npy'):
+        raise ValueError(f"Unknown output format {output_format!r}, expected 'csv' or 'npy'")
+    OUTPUT_FORMAT = output_format
+
+def output_path(base, ext):
+    """base + ext for CSV output, base + '.npy' when writing binary files."""
+    return f"{base}.npy" if OUTPUT_FORMAT == 'npy' else f"{base}{ext}"
+
+def is_binary(filename):
+    with open(filename, 'rb') as file:
+        return file.read(len(NPY_MAGIC)) == NPY_MAGIC
+
+def structured_dtype(columns):
+    return np.dtype([(str(name), np.asarray(values).dtype) for name, values in columns.items()])
+
+def to_structured(columns):
+    rows = len(next(iter(columns.values())))
+    table = np.empty(rows, dtype=structured_dtype(columns))
+    for name, values in columns.items():
+        table[str(name)] = values
+    return table
+
+def load_binary(filename):
+    """Memory-map a binary table; columns are views into the file."""
+    return np.load(filename, mmap_mode='r')
+
+def save_table(output_filename, columns, header=True, decimals=6):
+    """
+    Write a dict of equal-length columns. CSV output rounds to `decimals` (None = as is) and
+    writes the column names when header is True; .npy output keeps full precision and always
+    stores the names.
+    """
+    with TableWriter(output_filename, header, decimals) as writer:
+        writer.write(columns)
+
+class TableWriter:
+    """
+    Append blocks of columns to a CSV or .npy table without holding the whole table in memory.
+    The .npy header is written with room to spare and patched with the row count on close.
+    """
+
+    def __init__(self, output_filename, header=True, decimals=6):
+        self.output_filename = output_filename
+        self.header = header
+        self.decimals = decimals
+        self.binary = output_filename.endswith('.npy')
+        self.rows = 0
+        self.dtype = None
+        self.file = None
+        self.csv = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def write(self, columns):
+        if self.binary:
+            self.write_binary(columns)
+        else:
+            self.write_csv(columns)
+        self.rows += len(next(iter(columns.values())))
+
+    def write_csv(self, columns):
+        if self.csv is None:
+            self.csv = CsvWriter(self.output_filename, self.header, self.decimals)
+        self.csv.write(columns)
+
+    def write_binary(self, columns):
+        table = to_structured(columns)
+        if self.file is None:
+            self.dtype = table.dtype
+            self.file = open(self.output_filename, 'wb')
+            self.write_npy_header(0)
+        self.file.write(table.astype(self.dtype, copy=False).tobytes())
+
+    def write_npy_header(self, rows):
+        header = repr({'descr': np.lib.format.dtype_to_descr(self.dtype), 'fortran_order': False,
+                       'shape': (rows,)})
+        header_len = STREAM_HEADER_BYTES - len(NPY_MAGIC) - 4
+        if len(header) + 1 > header_len:
+            raise ValueError("Too many columns for the streamed .npy header")
+        self.file.write(NPY_MAGIC + b'\x01\x00' + header_len.to_bytes(2, 'little'))
+        self.file.write(header.ljust(header_len - 1).encode('latin1') + b'\n')
+
+    def close(self):
+        if self.csv is not None:
+            self.csv.close()
+            self.csv = None
+        if self.file is not None:
+            self.file.seek(0)
+            self.write_npy_header(self.rows)
+            self.file.close()
+            self.file = None
@@ -1,36 +1,140 @@
 import numpy as np
-import pandas as pd
 import matplotlib.pyplot as plt
 import os
 
-def load_data(filename):
+from csv_loader import load_csv, find_data_start
+import table_io
+from table_io import output_path, save_table
+from plot_decimation import EnvelopeLine
+
+ROW_INDEX_STRIDE = 1024
+SCAN_BYTES = 16 * 1024 * 1024
+
+def load_data(filename, usecols=None, dtype=None):
     """
     Load the CSV file, auto-detect where numeric data begins by skipping non-numeric header rows.
+    dtype (default float64) is the precision the samples are parsed into.
+    """
+    return load_csv(filename, usecols=usecols, dtype=dtype)
+
+def save_truncated_data(filename, cropped_df):
+    base, ext = os.path.splitext(filename)
+    output_filename = output_path(f"{base}_truncated", ext)
+    columns = {col: cropped_df[col].values for col in cropped_df.columns}
+    save_table(output_filename, columns, header=False, decimals=None)
+    print(f"Truncated data saved as: {output_filename}")
+    return output_filename
+
+def row_index_path(filename):
+    return f"{filename}.rowidx.npz"
+
+def build_row_index(filename, stride=ROW_INDEX_STRIDE):
+    """
+    One pass over the raw bytes recording the byte offset of every `stride`-th data row
+    (row 0 is the first numeric row). Saved next to the file and reused while the file's
+    size and modification time are unchanged.
+    """
+    header_lines = find_data_start(filename)
+    offsets = []
+    line = 0
+    position = 0
+    with open(filename, 'rb') as file:
+        while True:
+            block = file.read(SCAN_BYTES)
+            if not block:
+                break
+            # Every line after the first starts one byte past a newline
+            starts = position + np.flatnonzero(np.frombuffer(block, dtype=np.uint8) == ord('\n')) + 1
+            if position == 0:
+                starts = np.concatenate([[0], starts])
+            rows = np.arange(line, line + len(starts)) - header_lines
+            offsets.append(starts[(rows >= 0) & (rows % stride == 0)])
+            line += len(starts)
+            position += len(block)
+    stat = os.stat(filename)
+    offsets = np.concatenate(offsets) if offsets else np.zeros(0, dtype=np.int64)
+    offsets = offsets[offsets < stat.st_size]
+    np.savez(row_index_path(filename), offsets=offsets, stride=stride,
+             size=stat.st_size, mtime=stat.st_mtime_ns)
+    return offsets, stride
+
+def load_row_index(filename):
+    """Cached (offsets, stride) for filename, rebuilding the index if the file changed."""
+    stat = os.stat(filename)
+    try:
+        cached = np.load(row_index_path(filename))
+        if cached['size'] == stat.st_size and cached['mtime'] == stat.st_mtime_ns:
+            return cached['offsets'], int(cached['stride'])
+    except (OSError, KeyError, ValueError):
+        pass
+    return build_row_index(filename)
+
+def row_offset(file, offsets, stride, row, file_size):
+    """Byte offset where data row `row` starts (file_size if it is past the end)."""
+    block_row = row // stride
+    if block_row >= len(offsets):
+        return file_size
+    file.seek(offsets[block_row])
+    for _ in range(row % stride):
+        if not file.readline():
+            return file_size
+    return file.tell()
+
+def truncate_by_offsets(filename, start_idx, end_idx):
+    """
+    Write data rows start_idx..end_idx (inclusive) to _truncated by copying their bytes
+    directly, located through the cached row index. Nothing is parsed or reformatted, so
+    the cost depends on the size of the selection, not on the size of the capture.
+    """
+    offsets, stride = load_row_index(filename)
+    file_size = os.path.getsize(filename)
+    base, ext = os.path.splitext(filename)
+    output_filename = f"{base}_truncated{ext}"
+    with open(filename, 'rb') as source, open(output_filename, 'wb') as target:
+        start = row_offset(source, offsets, stride, start_idx, file_size)
+        end = row_offset(source, offsets, stride, end_idx + 1, file_size)
+        source.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            chunk = source.read(min(SCAN_BYTES, remaining))
+            if not chunk:
+                break
+            target.write(chunk)
+            remaining -= len(chunk)
+    print(f"Truncated data saved as: {output_filename}")
+    return output_filename
+
+def can_copy_rows(filename):
+    """Byte-range truncation applies to text captures written back out as text."""
+    return table_io.OUTPUT_FORMAT == 'csv' and not table_io.is_binary(filename)
+
+def detect_truncation(y, threshold=0.1, smooth=None, margin=0):
+    """
+    Headless counterpart of plot_and_select_truncation: (start_idx, end_idx) of the span where the
+    signal's moving-RMS envelope (about its median) reaches `threshold` x its peak value.
+    smooth is the envelope length in samples (default len(y) // 1000); margin widens the span
+    on both sides.
     """
-    with open(filename, 'r') as file:
-        lines = file.readlines()
-
-    start_index = 0
-    for i, line in enumerate(lines):
-        try:
-            float(line.strip().split(',')[0])
-            start_index = i
-            break
-        except ValueError:
-            continue
-
-    df = pd.read_csv(filename, skiprows=start_index, header=None)
-    return df
-
-def plot_and_select_truncation(df, filename, column_name, downsample_factor=1):
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    smooth = smooth or max(n // 1000, 1)
+    energy = np.concatenate([[0.0], np.cumsum((y - np.median(y))**2)])
+    lo = np.clip(np.arange(n) - smooth // 2, 0, n)
+    hi = np.clip(lo + smooth, 0, n)
+    envelope = np.sqrt((energy[hi] - energy[lo]) / (hi - lo))
+    above = np.flatnonzero(envelope >= threshold * envelope.max())
+    start_idx = max(int(above[0]) - margin, 0)
+    end_idx = min(int(above[-1]) + margin, n - 1)
+    print(f"Detected truncation range: {start_idx} to {end_idx}")
+    return start_idx, end_idx
+
+def plot_and_select_truncation(df, filename, column_name):
     y = df[column_name].values
     x = np.arange(len(y))
-    y_downsampled = y[::downsample_factor]
-    x_downsampled = x[::downsample_factor]
     data_length = len(y)
 
     fig, ax = plt.subplots(figsize=(12, 6))
-    ax.plot(x_downsampled, y_downsampled, '-', linewidth=0.5, color='b', label=f"Column {column_name}")
+    EnvelopeLine(ax, x, y, '-', linewidth=0.5, color='b', label=f"Column {column_name}")
     ax.set_title("Zoom & Pan | Click to set LEFT (green) and RIGHT (red) edges | Press Enter to confirm")
     ax.set_xlabel("Index")
     ax.set_ylabel("Signal")
@@ -78,12 +182,12 @@ def plot_and_select_truncation(df, filename, column_name, downsample_factor=1):
     start_idx, end_idx = sorted([left_point[0], right_point[0]])
     print(f"Selected truncation range: {start_idx} to {end_idx}")
 
-    cropped_df = df.iloc[start_idx:end_idx + 1].copy()
-
-    base, ext = os.path.splitext(filename)
-    output_filename = f"{base}_truncated{ext}"
-    cropped_df.to_csv(output_filename, index=False, header=False)
-    print(f"Truncated data saved as: {output_filename}")
+    # Only read from here on, so a view of the rows is enough
+    cropped_df = df.iloc[start_idx:end_idx + 1]
+    if can_copy_rows(filename):
+        output_filename = truncate_by_offsets(filename, start_idx, end_idx)
+    else:
+        output_filename = save_truncated_data(filename, cropped_df)
 
     show_plot = input("\nWould you like to view the truncated result? (Y/N): ").strip().upper()
     if show_plot == 'Y':
@@ -101,16 +205,30 @@ def plot_and_select_truncation(df, filename, column_name, downsample_factor=1):
 
 def main():
     filename = input("Enter CSV file path: ").strip('"')
+
+    known_range = input("Truncation range as start-end to skip the plot "
+                        "(auto = detect from the signal envelope, blank = select interactively): ").strip().lower()
+    if known_range == 'auto':
+        start_idx, end_idx = detect_truncation(load_data(filename, usecols=[0])[0].values)
+        known_range = f"{start_idx}-{end_idx}"
+    if known_range and can_copy_rows(filename):
+        start_idx, end_idx = sorted(int(value) for value in known_range.split('-'))
+        truncate_by_offsets(filename, start_idx, end_idx)
+        return
+
     df = load_data(filename)
+    if known_range:
+        start_idx, end_idx = sorted(int(value) for value in known_range.split('-'))
+        save_truncated_data(filename, df.iloc[start_idx:end_idx + 1])
+        return
 
     print("Available columns:")
     for i in range(df.shape[1]):
         print(f"{i}: Column {i}")
 
     col_idx = int(input("Enter the index of the column to view while truncating: "))
-    downsample_factor = int(input("Enter downsample factor for display (1 = full res): ") or 1)
 
-    plot_and_select_truncation(df, filename, col_idx, downsample_factor)
+    plot_and_select_truncation(df, filename, col_idx)
 
 if __name__ == "__main__":
     main()
@@ -1,28 +1,45 @@
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
+from scipy.signal import find_peaks, peak_widths
+from functools import lru_cache
 import os
 
+import fft_backend
+from csv_loader import load_csv
+from table_io import output_path, save_table
+from plot_decimation import EnvelopeLine
+
+TAPERS = ['none', 'tukey', 'hann', 'gaussian']
+DEFAULT_ALPHA = {'tukey': 0.5, 'gaussian': 0.25}
+
 def load_data(filename):
-    df = pd.read_csv(filename)
+    df = load_csv(filename, header=True)
     return df
 
 def fft_unshift_index(index, n):
-    return (index + n // 2) % n
+    """Index in the unshifted array of position `index` in fftshift's output (any n)."""
+    return (index - n // 2) % n
 
-def plot_and_collect_windows(df, column_name, num_windows, downsample_factor=1):
+def display_signal(df, column_name):
+    """The column as it is shown for window selection, and whether it was fftshifted."""
     y = df[column_name].values
-    x = np.arange(len(y))
-    n = len(y)
     fftshifted = False
 
-    if {'IFFT Real', 'IFFT Imag', 'IFFT Magnitude'}.issubset(df.columns):
+    if 'Full Length' in df.columns:
+        # Half spectrum (bins 0..n//2) is already in frequency order; windows are mirrored onto
+        # the negative frequencies when the full spectrum is rebuilt
+        print("Half-spectrum IFFT data detected — no fftshift needed.")
+    elif {'IFFT Real', 'IFFT Imag', 'IFFT Magnitude'}.issubset(df.columns):
         print("IFFT data detected — applying fftshift for visualization only.")
-        y = np.fft.fftshift(y)
+        y = fft_backend.fftshift(y)
         fftshifted = True
+    return y, fftshifted
 
-    y_downsampled = y[::downsample_factor]
-    x_downsampled = x[::downsample_factor]
+def plot_and_collect_windows(df, column_name, num_windows):
+    y, fftshifted = display_signal(df, column_name)
+    x = np.arange(len(y))
+    n = len(y)
     data_length = len(y)
 
     window_ranges = []
@@ -31,7 +48,7 @@ def plot_and_collect_windows(df, column_name, num_windows, downsample_factor=1):
         print(f"\nDefine window {i+1} of {num_windows}...")
 
         fig, ax = plt.subplots(figsize=(12, 6))
-        ax.plot(x_downsampled, y_downsampled, '-', linewidth=0.5, color='b', label=column_name)
+        EnvelopeLine(ax, x, y, '-', linewidth=0.5, color='b', label=column_name)
         ax.set_title(f"Window {i+1} — Click LEFT (green), then RIGHT (red). Press Enter after each.")
         ax.set_xlabel("Index")
         ax.set_ylabel(column_name)
@@ -82,22 +99,198 @@ def plot_and_collect_windows(df, column_name, num_windows, downsample_factor=1):
 
     return window_ranges, fftshifted
 
-def apply_zero_mask(df, cols_to_process, window_ranges):
-    mask = np.zeros(len(df), dtype=bool)
+def detect_windows(df, column_name, num_windows=1, width=None, rel_height=0.5, min_distance=1, dc_guard=0):
+    """
+    Headless counterpart of plot_and_collect_windows: one window around each of the num_windows
+    strongest peaks of the column (as displayed, i.e. fftshifted for full IFFT data).
+    The window spans the peak's width at rel_height of its prominence, or `width` samples
+    centred on the peak when given. Peaks closer than min_distance samples count as one, and
+    peaks within dc_guard bins of zero frequency are ignored.
+    For a conjugate-symmetric IFFT (a real capture) only positive-frequency peaks are
+    considered, since each has a mirror image of exactly equal height; remaining ties go to the
+    lower unshifted bin, so the choice never depends on rounding noise.
+    Returns (window_ranges, fftshifted) with ranges in unshifted indices, like the click UI.
+    """
+    y, fftshifted = display_signal(df, column_name)
+    n = len(y)
+    candidates = np.ones(n, dtype=bool)
+    if fftshifted:
+        unshifted = fft_backend.ifftshift(y)
+        if np.allclose(unshifted[1:], unshifted[:0:-1], rtol=1e-6, atol=1e-6 * np.max(np.abs(y))):
+            candidates[:n // 2] = False
+    peaks, _ = find_peaks(y, distance=min_distance)
+    peaks = peaks[candidates[peaks]]
+    if dc_guard:
+        dc = n // 2 if fftshifted else 0
+        peaks = peaks[np.abs(peaks - dc) >= dc_guard]
+    if peaks.size == 0:
+        peaks = np.array([np.flatnonzero(candidates)[np.argmax(y[candidates])]])
+    bins = fft_unshift_index(peaks, n) if fftshifted else peaks
+    # Highest first; equal heights in order of their unshifted bin
+    peaks = np.sort(peaks[np.lexsort((bins, -y[peaks]))[:num_windows]])
+
+    if width is None:
+        _, _, left, right = peak_widths(y, peaks, rel_height=rel_height)
+        left = np.floor(left).astype(int)
+        right = np.ceil(right).astype(int)
+    else:
+        left = np.clip(peaks - width // 2, 0, n - 1)
+        right = np.clip(peaks + (width - 1) // 2, 0, n - 1)
+
+    window_ranges = []
+    for start, end in zip(left.tolist(), right.tolist()):
+        if fftshifted:
+            start, end = fft_unshift_index(start, n), fft_unshift_index(end, n)
+        print(f"Detected window: {start} to {end}")
+        window_ranges.append((start, end))
+    return window_ranges, fftshifted
+
+def taper_values(u, taper, alpha):
+    """Taper shape at relative positions u in [0, 1] across a window."""
+    if taper == 'none':
+        return np.ones_like(u)
+    if taper == 'hann':
+        return np.sin(np.pi * u)**2
+    if taper == 'gaussian':
+        return np.exp(-0.5 * ((u - 0.5) / alpha)**2)
+    if taper == 'tukey':
+        if alpha <= 0:
+            return np.ones_like(u)
+        edge = np.minimum(u, 1 - u)
+        return np.where(edge < alpha / 2, 0.5 * (1 - np.cos(2 * np.pi * np.minimum(edge / alpha, 0.5))), 1.0)
+    raise ValueError(f"Unknown taper {taper!r}, expected one of {TAPERS}")
+
+def clip_ranges(n, window_ranges):
+    """
+    window_ranges limited to bins 0..n-1, as slicing did: a range running past the end stops at
+    n-1, and the part of a wrapping range (start > end) that lies outside the array is dropped.
+    """
+    clipped = []
     for start, end in window_ranges:
         if start <= end:
-            mask[start:end+1] = True
+            start, end = max(start, 0), min(end, n - 1)
+            if start <= end:
+                clipped.append((start, end))
+        elif start > n - 1:
+            if end >= 0:
+                clipped.append((0, min(end, n - 1)))
+        elif end < 0:
+            clipped.append((max(start, 0), n - 1))
         else:
-            mask[:end+1] = True
-            mask[start:] = True
-    df_masked = df.copy()
-    df_masked.loc[~mask, cols_to_process] = 0.0
-    return df_masked
+            clipped.append((start, end))
+    return tuple(clipped)
+
+@lru_cache(maxsize=64)
+def cached_weights(n, window_ranges, taper, alpha, dtype):
+    starts = np.array([start for start, _ in window_ranges], dtype=np.int64)
+    ends = np.array([end for _, end in window_ranges], dtype=np.int64)
+    # A window with start > end wraps around the array edge
+    lengths = (ends - starts) % n + 1
+    first = np.repeat(np.cumsum(lengths) - lengths, lengths)
+    offsets = np.arange(lengths.sum()) - first
+    span = np.repeat(np.maximum(lengths - 1, 1), lengths)
+    u = np.where(np.repeat(lengths, lengths) > 1, offsets / span, 0.5)
+
+    values = taper_values(u, taper, alpha)
+
+    weights = np.zeros(n)
+    # Each window lands in one slice, or two when it wraps; overlapping windows keep the larger weight
+    for start, length, stop in zip(starts.tolist(), lengths.tolist(), np.cumsum(lengths).tolist()):
+        segment = values[stop - length:stop]
+        head = min(length, n - start)
+        np.maximum(weights[start:start + head], segment[:head], out=weights[start:start + head])
+        np.maximum(weights[:length - head], segment[head:], out=weights[:length - head])
+    weights = weights.astype(dtype, copy=False)
+    weights.flags.writeable = False
+    return weights
+
+def window_weights(n, window_ranges, taper='none', alpha=None, dtype=np.float64):
+    """
+    Length-n weights that are 1 inside the (possibly wrapping) window ranges and 0 outside,
+    or shaped by a Tukey, Hann or Gaussian taper across each window; ranges are clipped to the
+    array first (clip_ranges), and the taper spans the clipped window. alpha is the Tukey taper
+    fraction (default 0.5) or the Gaussian standard deviation as a fraction of the window
+    length (default 0.25). Results are cached by (n, ranges, taper, alpha, dtype) and read-only;
+    pass dtype=np.float32 to window single-precision data without upcasting it.
+    """
+    if alpha is None:
+        alpha = DEFAULT_ALPHA.get(taper, 0.0)
+    window_ranges = clip_ranges(n, [(int(start), int(end)) for start, end in window_ranges])
+    if not window_ranges:
+        return np.zeros(n, dtype=dtype)
+    return cached_weights(n, window_ranges, taper, float(alpha), np.dtype(dtype))
+
+def build_mask(n, window_ranges):
+    """Boolean mask of length n that is True inside the (possibly wrapping) window ranges."""
+    return window_weights(n, window_ranges) > 0
+
+def float_dtype(data):
+    """dtype windowed data is kept in: float32/complex64 stay single precision, anything else is promoted to double."""
+    if data.dtype.kind in 'fc':
+        return np.result_type(data.dtype, np.float32)
+    return np.result_type(data.dtype, float)
+
+def apply_mask_inplace(data, window_ranges, taper='none', alpha=None, axis=-1):
+    """
+    Window every scan of `data` (any shape, real or complex) along `axis`, in place.
+    Hard windows set the samples outside to exactly 0; tapers multiply by the weights.
+    """
+    shape = [1] * data.ndim
+    shape[axis] = data.shape[axis]
+    weights = window_weights(data.shape[axis], window_ranges, taper, alpha, data.real.dtype).reshape(shape)
+    if taper == 'none':
+        np.copyto(data, 0, where=weights == 0)
+    else:
+        data *= weights
+    return data
+
+def apply_zero_mask(df, cols_to_process, window_ranges, taper='none', alpha=None):
+    """Copy of df with cols_to_process windowed; the other columns are shared, not copied."""
+    columns = {}
+    for col in df.columns:
+        values = df[col].values
+        if col in cols_to_process:
+            values = apply_mask_inplace(values.astype(float_dtype(values)), window_ranges, taper, alpha)
+        columns[col] = values
+    return pd.DataFrame(columns, index=df.index, copy=False)
+
+def apply_zero_mask_batch(data, window_ranges, axis=-1, taper='none', alpha=None):
+    """
+    Batched apply_zero_mask for a (scans x samples) array: every scan is windowed with the
+    same window ranges along `axis`. Returns a new array; see apply_mask_inplace to avoid the copy.
+    """
+    data = np.asarray(data)
+    return apply_mask_inplace(np.array(data, dtype=float_dtype(data)), window_ranges, taper, alpha, axis)
+
+def save_masked_data(filename, masked_df):
+    base, ext = os.path.splitext(filename)
+    output_filename = output_path(f"{base}_zeroedout", ext)
+    columns = {col: masked_df[col].values for col in masked_df.columns}
+    save_table(output_filename, columns, decimals=None)
+    print(f"Windowed data saved as: {output_filename}")
+    return output_filename
+
+def check_window_ranges(n=10):
+    """
+    Compare build_mask with the slices the ranges select (mask[start:end + 1], or both ends of
+    the array for a wrapping range), including ranges that run past the end of the array.
+    Raises AssertionError on a mismatch.
+    """
+    for ranges in ([(2, 4)], [(5, n + 2)], [(n - 2, 2)], [(n + 2, n + 5)], [(n + 2, 3)], [(n - 3, 3), (5, n + 2)]):
+        expected = np.zeros(n, dtype=bool)
+        for start, end in ranges:
+            if start <= end:
+                expected[start:end + 1] = True
+            else:
+                expected[:end + 1] = True
+                expected[start:] = True
+        assert np.array_equal(build_mask(n, ranges), expected), f"window {ranges} on {n} bins"
+    # A taper spans the part of the window inside the array
+    assert np.all(window_weights(n, [(5, n + 2)], 'hann')[:5] == 0), "window leaks past the end of the array"
 
 def main():
     filename = input("Enter CSV file path: ").strip('"')
     df = load_data(filename)
-    downsample_factor = int(input("Enter downsample factor for display (1 = full res): ") or 1)
     num_windows = int(input("How many windows would you like to define? ") or 1)
 
     if {'IFFT Real', 'IFFT Imag', 'IFFT Magnitude'}.issubset(df.columns):
@@ -111,13 +304,21 @@ def main():
         column_name = df.columns[col_idx]
         cols_to_process = [column_name]
 
-    window_ranges, fftshifted = plot_and_collect_windows(df, column_name, num_windows, downsample_factor)
+    if input("Detect windows automatically around the strongest peaks? (Y/N): ").strip().upper() == 'Y':
+        width = input("Window width in samples (blank = peak width at half height): ").strip()
+        dc_guard = int(input("Ignore peaks within this many bins of DC (default 0): ") or 0)
+        window_ranges, fftshifted = detect_windows(df, column_name, num_windows, int(width) if width else None,
+                                                   dc_guard=dc_guard)
+    else:
+        window_ranges, fftshifted = plot_and_collect_windows(df, column_name, num_windows)
 
-    masked_df = apply_zero_mask(df, cols_to_process, window_ranges)
-    base, ext = os.path.splitext(filename)
-    output_filename = f"{base}_zeroedout{ext}"
-    masked_df.to_csv(output_filename, index=False)
-    print(f"Windowed data saved as: {output_filename}")
+    taper = input("Window taper (none/tukey/hann/gaussian, default none = hard zeroing): ").strip().lower() or 'none'
+    alpha = None
+    if taper in DEFAULT_ALPHA:
+        alpha = float(input(f"Taper parameter (default {DEFAULT_ALPHA[taper]}): ") or DEFAULT_ALPHA[taper])
+
+    masked_df = apply_zero_mask(df, cols_to_process, window_ranges, taper, alpha)
+    save_masked_data(filename, masked_df)
 
     print("\nWould you like to view the resulting windowed signal?")
     print("A: Yes (shifted)")
@@ -129,8 +330,8 @@ def main():
         plt.figure(figsize=(10, 5))
         for col in cols_to_process:
             values = masked_df[col].values
-            if show_plot == 'A':
-                values = np.fft.fftshift(values)
+            if show_plot == 'A' and 'Full Length' not in masked_df.columns:
+                values = fft_backend.fftshift(values)
             plt.plot(values, label=col)
         title = "Windowed Signal (Shifted)" if show_plot == 'A' else "Windowed Signal (Non-Shifted)"
         plt.title(title)
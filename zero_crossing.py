@@ -1,52 +1,103 @@
 import numpy as np
-import pandas as pd
 import os
 
-def read_interpolated_csv(filename):
-    """Reads interpolated CSV and returns index, measurement, and reference arrays."""
-    df = pd.read_csv(filename)
+from csv_loader import load_csv
+from table_io import output_path, save_table
+
+INTERPOLATED_COLUMNS = ['Index', 'Interpolated Measurement', 'Interpolated Reference']
+
+def read_interpolated_csv(filename, dtype=np.float64):
+    """Reads interpolated CSV and returns index, measurement, and reference arrays (the index stays float64)."""
+    df = load_csv(filename, usecols=INTERPOLATED_COLUMNS, header=True,
+                  dtype={'Index': np.float64, 'Interpolated Measurement': dtype, 'Interpolated Reference': dtype})
     return df['Index'].values, df['Interpolated Measurement'].values, df['Interpolated Reference'].values
 
-def find_zero_crossings(reference, measurement, index):
+CROSSING_MODES = ['nearest', 'linear', 'cubic']
+
+def cubic_weights(t):
+    """Lagrange weights (and their derivatives) for samples at i-1, i, i+1, i+2 evaluated at i + t."""
+    w = np.stack([
+        -t * (t - 1) * (t - 2) / 6,
+        (t + 1) * (t - 1) * (t - 2) / 2,
+        -(t + 1) * t * (t - 2) / 2,
+        (t + 1) * t * (t - 1) / 6,
+    ])
+    dw = np.stack([
+        -(3 * t**2 - 6 * t + 2) / 6,
+        (3 * t**2 - 4 * t - 1) / 2,
+        -(3 * t**2 - 2 * t - 2) / 2,
+        (3 * t**2 - 1) / 6,
+    ])
+    return w, dw
+
+def find_zero_crossings(reference, measurement, index, mode='nearest'):
     """
     Find zero-crossings in the reference signal.
-    Return original index values and corresponding measurement values at those crossings.
+    Return original index values and corresponding measurement values at those crossings,
+    plus the position of each crossing in the interpolated array, all as NumPy arrays.
+
+    mode='nearest' snaps each crossing to whichever of i, i+1 is closer to zero.
+    mode='linear' / 'cubic' locate the crossing between i and i+1 by a linear or 4-point
+    cubic root solve and interpolate the measurement there, so the returned positions are
+    fractional.
+
+    The measurement values and the root solve keep the precision of the inputs (float32 stays
+    float32); crossing positions are float64.
     """
-    zero_crossing_indices = np.where(np.diff(np.sign(reference)))[0]
-    refined_indices = []
-    measurement_at_crossings = []
-    original_indices = []
+    reference = np.asarray(reference)
+    measurement = np.asarray(measurement)
+    index = np.asarray(index)
+    i = np.flatnonzero(np.diff(np.sign(reference)))
 
-    for i in zero_crossing_indices:
+    if mode == 'nearest':
         # Pick the point closest to zero between i and i+1
-        if abs(reference[i]) <= abs(reference[i + 1]):
-            refined_indices.append(i)
-        else:
-            refined_indices.append(i + 1)
+        refined_indices = np.where(np.abs(reference[i]) <= np.abs(reference[i + 1]), i, i + 1)
+        return index[refined_indices], measurement[refined_indices], refined_indices
 
-        original_indices.append(index[refined_indices[-1]])
-        measurement_at_crossings.append(measurement[refined_indices[-1]])
+    r0 = reference[i]
+    r1 = reference[i + 1]
+    denom = r0 - r1
+    t = np.divide(r0, denom, out=np.zeros(i.shape, dtype=np.result_type(reference, np.float32)), where=denom != 0)
 
+    if mode == 'linear':
+        measurement_at_crossings = measurement[i] + t * (measurement[i + 1] - measurement[i])
+    elif mode == 'cubic':
+        last = reference.size - 1
+        neighbours = np.stack([np.maximum(i - 1, 0), i, i + 1, np.minimum(i + 2, last)])
+        ref_pts = reference[neighbours]
+        # Newton iterations on the cubic through the four neighbours, starting from the linear estimate
+        for _ in range(4):
+            w, dw = cubic_weights(t)
+            value = np.sum(w * ref_pts, axis=0)
+            slope = np.sum(dw * ref_pts, axis=0)
+            step = np.divide(value, slope, out=np.zeros_like(t), where=slope != 0)
+            t = np.clip(t - step, 0.0, 1.0)
+        w, _ = cubic_weights(t)
+        measurement_at_crossings = np.sum(w * measurement[neighbours], axis=0)
+    else:
+        raise ValueError(f"Unknown crossing mode {mode!r}, expected one of {CROSSING_MODES}")
+
+    refined_indices = i + t
+    original_indices = index[i] + t * (index[i + 1] - index[i])
     return original_indices, measurement_at_crossings, refined_indices
 
 def save_crossing_data(filename, index, interpolated_indices, measurements):
-    """Save zero-crossing info to a CSV file."""
+    """Save zero-crossing info to a CSV (or binary) file."""
     base, ext = os.path.splitext(filename)
-    output_filename = f"{base}_zc.csv"
+    output_filename = output_path(f"{base}_zc", ".csv")
 
-    df_out = pd.DataFrame({
-        "Original Index": np.round(index[:len(interpolated_indices)], 6),
-        "Interpolated Array Index": np.round(interpolated_indices, 6),
-        "Measurement at Zero-Crossing": np.round(measurements, 6)
+    save_table(output_filename, {
+        "Original Index": np.asarray(index)[:len(interpolated_indices)],
+        "Interpolated Array Index": np.asarray(interpolated_indices),
+        "Measurement at Zero-Crossing": np.asarray(measurements)
     })
-
-    df_out.to_csv(output_filename, index=False)
     print(f"Saved zero-crossing data to {output_filename}")
 
 def main():
     filename = input("Enter interpolated CSV file path: ").strip('"')
+    mode = input(f"Crossing estimate ({'/'.join(CROSSING_MODES)}, default nearest): ").strip().lower() or 'nearest'
     index, measurement, reference = read_interpolated_csv(filename)
-    original_idx_vals, meas_vals, interpolated_indices = find_zero_crossings(reference, measurement, index)
+    original_idx_vals, meas_vals, interpolated_indices = find_zero_crossings(reference, measurement, index, mode)
     save_crossing_data(filename, original_idx_vals, interpolated_indices, meas_vals)
 
 if __name__ == "__main__":